@@ -0,0 +1,68 @@
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: kcd_trace
+    type: aggregate
+    short_description: Record per-task, per-host durations for kcdcli traces
+    description:
+      - Appends one JSON line per finished task and host to the file named by KCD_TRACE_ANSIBLE_FILE.
+      - kcdcli merges the lines into its trace after the playbook ends.
+    requirements:
+      - enable in configuration
+'''
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'kcd_trace'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.path = os.environ.get('KCD_TRACE_ANSIBLE_FILE')
+        self.play = None
+        self.started = {}
+
+    def v2_playbook_on_play_start(self, play):
+        self.play = play.get_name()
+
+    def v2_runner_on_start(self, host, task):
+        self.started[(host.get_name(), task._uuid)] = time.time()
+
+    def _finish(self, result, status):
+        host = result._host.get_name()
+        task = result._task
+        start = self.started.pop((host, task._uuid), None)
+        if start is None or not self.path:
+            return
+        record = {
+            'host': host,
+            'play': self.play,
+            'task': task.get_name(),
+            'action': task.action,
+            'status': status,
+            'start': start,
+            'end': time.time(),
+        }
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+    def v2_runner_on_ok(self, result):
+        self._finish(result, 'changed' if result._result.get('changed') else 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._finish(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._finish(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._finish(result, 'unreachable')
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Ansible dynamic inventory for kcdcli clusters
+
+    ansible-playbook -i inventories/kcd_inventory.py site.yml
+
+Serves inventories/<provider>/inventory.json, written next to the INI hosts
+file, as the --list response, so Ansible never parses the INI file or calls
+--host per node. Where the repository's terraform directory is available
+and its state is newer than that file, the inventory is first rebuilt from
+`terraform output -json`. KCD_PROVIDER picks the provider (default aws). A
+rebuilt inventory keeps the connection variables of the cached one;
+KCD_SSH_USER and KCD_SSH_KEY override them.
+"""
+import json
+import os
+import sys
+
+INVENTORY_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(INVENTORY_DIR))
+
+def _cached_connection_vars(inventory_class, cache_path):
+    """Return {host: ansible_* vars} of the cached inventory, empty if there is none"""
+    try:
+        cached = inventory_class.load(cache_path)
+    except (OSError, ValueError):
+        return {}
+    return {
+        host: {key: value for key, value in variables.items() if key.startswith("ansible_")}
+        for host, variables in cached.hosts.items()
+    }
+
+def refresh(provider, cache_path):
+    """Rebuild the cached response from terraform outputs if the state changed since it was written"""
+    sys.path.insert(0, REPO_ROOT)
+    try:
+        from cli.utils.inventory import Inventory
+        from cli.utils.terraform import TerraformManager
+    except ImportError:
+        # Copied to the bastion without the CLI: serve what was synced
+        return
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        tf = TerraformManager(provider)
+        state_path = tf.local_state_path()
+        if not state_path or not os.path.isfile(state_path):
+            return
+        if os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(state_path):
+            return
+        connection = _cached_connection_vars(Inventory, cache_path)
+        host_vars = {}
+        if os.getenv("KCD_SSH_USER"):
+            host_vars["ansible_user"] = os.environ["KCD_SSH_USER"]
+        if os.getenv("KCD_SSH_KEY"):
+            host_vars["ansible_ssh_private_key_file"] = os.environ["KCD_SSH_KEY"]
+        inventory = Inventory.from_terraform_outputs(tf.output())
+        # Hosts keep the connection vars they were written with; new hosts get
+        # those of an existing one, and the environment overrides both
+        fallback = next((variables for variables in connection.values() if variables), {})
+        for host in inventory.hosts:
+            inventory.add_host(host, **dict(connection.get(host, fallback), **host_vars))
+        inventory.write(cache_path)
+    except Exception as e:
+        sys.stderr.write(f"kcd_inventory: keeping the cached inventory, refresh failed: {e}\n")
+    finally:
+        os.chdir(cwd)
+
+def main():
+    provider = os.getenv("KCD_PROVIDER", "aws")
+    cache_path = os.path.join(INVENTORY_DIR, provider, "inventory.json")
+    if "--list" in sys.argv or "--host" not in sys.argv:
+        refresh(provider, cache_path)
+    try:
+        with open(cache_path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        data = {"_meta": {"hostvars": {}}}
+
+    if "--host" in sys.argv:
+        host = sys.argv[sys.argv.index("--host") + 1]
+        json.dump(data.get("_meta", {}).get("hostvars", {}).get(host, {}), sys.stdout)
+    else:
+        json.dump(data, sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Check that the kubectl and API backends of KubernetesManager agree
+
+    python3 benchmarks/check_backends.py
+
+Serves the fake cluster of fake_tool.py from a local stand-in API server
+(lists, and server-side tables rendered the way the real server renders
+them) and compares what both backends report for nodes and pods. Exits
+with status 1 on any difference.
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import run
+from fake_tool import node_objects, node_status_text, pod_objects, pod_status_text
+
+# path -> (objects, Status column of the server-side table)
+RESOURCES = {
+    "/api/v1/nodes": (node_objects, node_status_text),
+    "/api/v1/namespaces/kube-system/pods": (pod_objects, pod_status_text),
+}
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/version":
+            return self._reply({"major": "1", "minor": "29"})
+        if path not in RESOURCES:
+            return self._reply({"kind": "Status", "code": 404}, status=404)
+        objects, status_text = RESOURCES[path]
+        items = objects()
+        if "as=Table" in self.headers.get("Accept", ""):
+            self._reply({
+                "kind": "Table",
+                "columnDefinitions": [{"name": "Name"}, {"name": "Status"}],
+                "rows": [{"cells": [item["metadata"]["name"], status_text(item)]} for item in items],
+                "metadata": {},
+            })
+        else:
+            self._reply({"kind": "List", "items": items, "metadata": {"resourceVersion": "1"}})
+
+    def _reply(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    workspace, env = run.make_workspace(run.SCALES["small"], 0, 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        os.environ.update(env)
+        os.chdir(workspace)
+        os.makedirs(os.path.join("config", "kubeconfig"))
+        with open(os.path.join("config", "kubeconfig", "aws-config"), "w") as file:
+            json.dump({
+                "current-context": "fake",
+                "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+                "clusters": [{"name": "fake", "cluster": {"server": f"http://127.0.0.1:{server.server_port}"}}],
+                "users": [{"name": "fake", "user": {"token": "fake"}}],
+            }, file)
+
+        from cli.utils.kubernetes import KubernetesManager
+        managers = {backend: KubernetesManager("aws", timeout=10, backend=backend) for backend in ("kubectl", "api")}
+        failures = []
+        for query in ("get_nodes", "get_pods"):
+            results = {backend: getattr(manager, query)() for backend, manager in managers.items()}
+            if results["kubectl"] != results["api"]:
+                failures.append(f"{query}: kubectl {results['kubectl']} != api {results['api']}")
+            else:
+                print(f"{query}: {len(results['api'])} entries agree")
+        for manager in managers.values():
+            manager.close()
+    finally:
+        server.shutdown()
+        os.chdir(run.REPO_ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if failures:
+        print("\nBackends disagree:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
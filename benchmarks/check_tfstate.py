@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Check that the streaming Terraform JSON readers reject truncated documents
+
+    python3 benchmarks/check_tfstate.py
+
+Feeds a state file and a `terraform show -json` document, whole and cut
+short at several points, through the readers at several chunk sizes. Whole
+documents must yield every resource; truncated ones must raise ValueError
+rather than return partial results. Exits with status 1 otherwise.
+"""
+import io
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from cli.utils.tfstate import iter_show_resources, iter_state_resources
+
+CHUNK_SIZES = (1, 7, 64, 1 << 16)
+RESOURCES = 20
+
+def state_document():
+    return json.dumps({"version": 4, "serial": 3, "lineage": "check", "resources": [
+        {"module": "module.m", "mode": "managed", "type": "aws_instance", "name": "node",
+         "instances": [{"index_key": index, "attributes": {"instance_state": "running"}}]}
+        for index in range(RESOURCES)
+    ]}).encode()
+
+def show_document():
+    return json.dumps({"format_version": "1.0", "values": {"root_module": {"resources": [], "child_modules": [
+        {"address": "module.m", "resources": [
+            {"address": f"module.m.aws_instance.node[{index}]", "type": "aws_instance",
+             "values": {"instance_state": "running"}}
+            for index in range(RESOURCES)
+        ]}
+    ]}}}).encode()
+
+def main():
+    failures = []
+    for name, reader, document in (("state", iter_state_resources, state_document()),
+                                   ("show", iter_show_resources, show_document())):
+        # Cut inside the header, mid-resource, between resources and just before the last brace
+        cuts = (10, len(document) // 2, document.index(b"}, {") + 3, len(document) - 1)
+        for chunk_size in CHUNK_SIZES:
+            found = list(reader(io.BytesIO(document), chunk_size))
+            if len(found) != RESOURCES:
+                failures.append(f"{name}, chunks of {chunk_size}: {len(found)} of {RESOURCES} resources")
+            for cut in cuts:
+                try:
+                    partial = list(reader(io.BytesIO(document[:cut]), chunk_size))
+                except ValueError:
+                    continue
+                failures.append(f"{name} cut at byte {cut}, chunks of {chunk_size}: "
+                                f"returned {len(partial)} resources instead of raising")
+
+    if failures:
+        print("Truncated Terraform JSON accepted:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"whole documents parse and truncated ones raise at chunk sizes {', '.join(map(str, CHUNK_SIZES))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Check that Terraform runs never inherit another run's workspace
+
+    python3 benchmarks/check_workspaces.py
+
+Against the fake terraform of fake_tool.py, which keeps workspaces the way
+terraform does, a manager for a named workspace plans first and a default
+manager of the same root plans after it. The default run must still use
+the default workspace, and the root's selection must be left as it was.
+Exits with status 1 otherwise.
+"""
+import os
+import shutil
+import sys
+
+import run
+
+def main():
+    workspace, env = run.make_workspace({"nodes": 3, "resources": 3}, 0, 0)
+    failures = []
+    try:
+        os.environ.update(env)
+        os.chdir(workspace)
+        from cli.utils.terraform import TerraformManager
+
+        named = TerraformManager("aws", workspace="dev")
+        named.init()
+        named.ensure_workspace()
+        named.plan()
+        default = TerraformManager("aws")
+        default.ensure_workspace()
+        default.plan()
+
+        with open(env["KCD_BENCH_CALLS"], "r") as file:
+            plans = [line.split()[-1] for line in file if line.startswith("terraform plan")]
+        if plans != ["@dev", "@default"]:
+            failures.append(f"plans ran in {plans}, expected ['@dev', '@default']")
+        with open(os.path.join(default.tf_dir, ".terraform", "environment"), "r") as file:
+            selected = file.read().strip() or "default"
+        if selected != "default":
+            failures.append(f"the root was left with workspace {selected} selected")
+        if not failures:
+            print("named and default workspaces stay separate")
+    finally:
+        os.chdir(run.REPO_ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if failures:
+        print("\nWorkspaces leak:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
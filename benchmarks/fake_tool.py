@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for aws, az, gcloud, terraform, kubectl, ssh, scp and ansible
+
+benchmarks/run.py links this file into a bin directory under each tool's
+name and puts that directory first on PATH. The name it is called by picks
+the behaviour; the environment sets the synthetic scale:
+
+    KCD_BENCH_NODES         cluster nodes (master + workers)
+    KCD_BENCH_RESOURCES     terraform resources
+    KCD_BENCH_LATENCY       seconds every call sleeps before answering
+    KCD_BENCH_OUTPUT_BYTES  extra log output every call prints
+    KCD_BENCH_CALLS         file that gets one line per call
+"""
+import json
+import os
+import sys
+import time
+
+NODES = int(os.getenv("KCD_BENCH_NODES", "10"))
+RESOURCES = int(os.getenv("KCD_BENCH_RESOURCES", "100"))
+LATENCY = float(os.getenv("KCD_BENCH_LATENCY", "0"))
+OUTPUT_BYTES = int(os.getenv("KCD_BENCH_OUTPUT_BYTES", "0"))
+
+PLAYBOOK_TASKS = ("Gathering Facts", "Install packages", "Clone bootstrap repo", "Run node setup",
+                  "Initialize control plane", "Join workers")
+
+def node_ip(index):
+    """Private IP of node index (0 is the master)"""
+    index += 10
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+def node_name(index):
+    return "k8s-master" if index == 0 else f"k8s-worker-{index}"
+
+def nodes():
+    for index in range(NODES):
+        yield node_name(index), node_ip(index)
+
+def node_objects():
+    """Node objects as the API server and kubectl return them"""
+    return [{
+        "metadata": {"name": name},
+        "status": {"conditions": [{"type": "Ready", "status": "True"}], "addresses": [{"address": ip}]},
+    } for name, ip in nodes()]
+
+def pod_objects():
+    """kube-system pod objects; one is crash looping while its phase stays Running"""
+    names = [f"kube-proxy-{index}" for index in range(NODES)] + ["coredns-0", "coredns-1", "etcd-k8s-master"]
+    items = [{"metadata": {"name": name}, "status": {"phase": "Running"}} for name in names]
+    items[-2]["status"]["containerStatuses"] = [{"state": {"waiting": {"reason": "CrashLoopBackOff"}}}]
+    return items
+
+def node_status_text(node):
+    """Status column of a node in a server-side table"""
+    return "Ready"
+
+def pod_status_text(pod):
+    """Status column of a pod in a server-side table: the waiting reason if any, else the phase"""
+    for container in pod["status"].get("containerStatuses", []):
+        reason = container.get("state", {}).get("waiting", {}).get("reason")
+        if reason:
+            return reason
+    return pod["status"]["phase"]
+
+def write(text):
+    sys.stdout.write(text)
+
+def padding():
+    """Print OUTPUT_BYTES of log lines"""
+    line = "x" * 99 + "\n"
+    for _ in range(OUTPUT_BYTES // len(line)):
+        write(line)
+
+def record(name, args):
+    path = os.getenv("KCD_BENCH_CALLS")
+    if not path:
+        return
+    # O_APPEND writes this small are atomic, so concurrent calls never interleave
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # terraform calls also note the workspace they ran against
+        suffix = f" @{current_workspace()}" if name == "terraform" and args[:1] != ["workspace"] else ""
+        os.write(fd, f"{name} {' '.join(args[:2])}{suffix}\n".encode())
+    finally:
+        os.close(fd)
+
+def aws(args):
+    # describe-instances --output text: Name, PublicIpAddress, PrivateIpAddress
+    write("bastion-host\t3.3.3.3\t10.0.0.5\n")
+    for name, ip in nodes():
+        write(f"{name}\tNone\t{ip}\n")
+    return 0
+
+def az(args):
+    # vm list --output tsv: tags.Name, name, then the queried fields
+    write("bastion*\tbastion-host\t3.3.3.3\t10.0.0.5\n")
+    for name, ip in nodes():
+        write(f"k8s-*\t{name}\t\t{ip}\n")
+    return 0
+
+def gcloud(args):
+    # compute instances list --format value(name, ...)
+    write("bastion-host\t3.3.3.3\t10.0.0.5\n")
+    for name, ip in nodes():
+        write(f"{name}\t\t{ip}\n")
+    return 0
+
+def _resource(index):
+    module = ("vpc", "security_groups", "ec2_instances")[index % 3]
+    return {
+        "address": f"module.{module}.aws_instance.node[{index}]",
+        "type": "aws_instance",
+        "name": "node",
+        "values": {"instance_state": "running", "id": f"i-{index:017x}"},
+    }
+
+def show_json():
+    """Stream `terraform show -json` for RESOURCES resources spread over child modules"""
+    write('{"format_version":"1.0","values":{"root_module":{"resources":[],"child_modules":[')
+    for module in range(3):
+        if module:
+            write(",")
+        write(f'{{"address":"module.m{module}","resources":[')
+        write(",".join(json.dumps(_resource(index)) for index in range(module, RESOURCES, 3)))
+        write("]}")
+    write("]}}}\n")
+
+def _workspaces():
+    """Workspaces of the fake root in the current directory and the selected one"""
+    names = ["default"]
+    if os.path.isdir("terraform.tfstate.d"):
+        names += sorted(os.listdir("terraform.tfstate.d"))
+    try:
+        with open(os.path.join(".terraform", "environment"), "r") as file:
+            selected = file.read().strip() or "default"
+    except OSError:
+        selected = "default"
+    return names, selected
+
+def current_workspace():
+    """Workspace a command runs against: TF_WORKSPACE, else the selected one"""
+    return os.getenv("TF_WORKSPACE") or _workspaces()[1]
+
+def workspace(args):
+    names, selected = _workspaces()
+    command, name = (args + ["", ""])[1], args[-1]
+    if command == "list":
+        write("".join(f"{'*' if ws == selected else ' '} {ws}\n" for ws in names))
+        return 0
+    if (command == "new" and name in names) or (command == "select" and name not in names and "-or-create=true" not in args):
+        problem = "already exists" if command == "new" else "doesn't exist"
+        sys.stderr.write(f"Workspace \"{name}\" {problem}.\n")
+        return 1
+    if name != "default":
+        os.makedirs(os.path.join("terraform.tfstate.d", name), exist_ok=True)
+    os.makedirs(".terraform", exist_ok=True)
+    with open(os.path.join(".terraform", "environment"), "w") as file:
+        file.write(name)
+    return 0
+
+def terraform(args):
+    command = args[0] if args else ""
+    machine_readable = "-json" in args
+    if command == "workspace":
+        return workspace(args)
+    if command not in ("init", "version") and current_workspace() not in _workspaces()[0]:
+        sys.stderr.write(f"Currently selected workspace \"{current_workspace()}\" does not exist\n")
+        return 1
+    if command == "init":
+        os.makedirs(os.path.join(".terraform", "providers"), exist_ok=True)
+        write("Initializing the backend...\nInitializing provider plugins...\nTerraform has been successfully initialized!\n")
+    elif command == "plan":
+        for index in range(RESOURCES):
+            address = _resource(index)["address"]
+            if machine_readable:
+                write(json.dumps({"type": "planned_change", "change": {"resource": {"addr": address}, "action": "create"}}) + "\n")
+            else:
+                write(f"  # {address} will be created\n")
+        write(f"Plan: {RESOURCES} to add, 0 to change, 0 to destroy.\n")
+    elif command in ("apply", "destroy"):
+        verb = "Creation" if command == "apply" else "Destruction"
+        for index in range(RESOURCES):
+            address = _resource(index)["address"]
+            if machine_readable:
+                write(json.dumps({
+                    "@message": f"{address}: {verb} complete after 1s",
+                    "@timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime()),
+                    "type": "apply_complete",
+                    "hook": {"resource": {"addr": address}, "action": "create", "elapsed_seconds": 1},
+                }) + "\n")
+            else:
+                write(f"{address}: {verb} complete after 1s\n")
+        write(f"Apply complete! Resources: {RESOURCES} added, 0 changed, 0 destroyed.\n")
+    elif command == "show":
+        show_json()
+    elif command == "output":
+        ips = [ip for _, ip in nodes()]
+        write(json.dumps({
+            "Master_Node_IP": {"value": ips[0] if ips else None},
+            "Worker_Node_IPs": {"value": ips[1:]},
+        }) + "\n")
+    return 0
+
+def kubectl(args):
+    if "cluster-info" in args:
+        write("Kubernetes control plane is running at https://10.0.0.10:6443\n")
+    elif "nodes" in args:
+        write(json.dumps({"items": node_objects()}))
+    elif "pods" in args:
+        write(json.dumps({"items": pod_objects()}))
+    elif "componentstatuses" in args:
+        write(json.dumps({"items": [
+            {"metadata": {"name": name}, "conditions": [{"type": "Healthy", "status": "True"}]}
+            for name in ("scheduler", "controller-manager", "etcd-0")
+        ]}))
+    return 0
+
+def ansible_playbook(args):
+    hosts = [ip for _, ip in nodes()]
+    write("PLAY [Kubernetes nodes] ***\n")
+    for task in PLAYBOOK_TASKS:
+        write(f"\nTASK [{task}] ***\n")
+        write("".join(f"ok: [{host}]\n" for host in hosts))
+    write("\nPLAY RECAP ***\n")
+    write("".join(f"{host} : ok={len(PLAYBOOK_TASKS)} changed=0 unreachable=0 failed=0\n" for host in hosts))
+    return 0
+
+def ssh(args):
+    remote = args[-1] if args else ""
+    if "os-release" in remote:
+        write('NAME="Ubuntu"\nVERSION="22.04 LTS"\nID=ubuntu\n')
+    elif ".kcd-manifest.json" in remote:
+        return 1
+    elif "tar xzf -" in remote:
+        # Swallow the archive like the remote tar would
+        while sys.stdin.buffer.read(1 << 16):
+            pass
+    elif "ansible-playbook" in remote:
+        return ansible_playbook(args)
+    return 0
+
+def command(args):
+    # `command -v <tool>` as probed by run_commands.SSHManager.detect_package_manager
+    return 0 if args[-1:] == ["apt"] else 1
+
+TOOLS = {
+    "aws": aws,
+    "az": az,
+    "gcloud": gcloud,
+    "terraform": terraform,
+    "kubectl": kubectl,
+    "ssh": ssh,
+    "scp": lambda args: 0,
+    "ansible-playbook": ansible_playbook,
+    "ansible": lambda args: 0,
+    "command": command,
+}
+
+def main():
+    name = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    record(name, args)
+    # Opening and closing ssh control masters is local and instant
+    control = name == "ssh" and ("-fN" in args or "-O" in args)
+    if LATENCY and not control:
+        time.sleep(LATENCY)
+    if name not in TOOLS:
+        sys.stderr.write(f"fake_tool: no stand-in for {name}\n")
+        return 127
+    returncode = TOOLS[name](args)
+    if not control:
+        padding()
+    sys.stdout.flush()
+    return returncode
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark the orchestration paths against local fake cloud tools
+
+    python3 benchmarks/run.py                          # compare with benchmarks/baseline.json
+    python3 benchmarks/run.py --scales small,large --latency 0.05
+    python3 benchmarks/run.py --save-baseline          # record the current numbers
+
+Every scenario runs in a fresh interpreter inside a scratch copy of
+ansible/ and terraform/, with benchmarks/fake_tool.py standing in for aws,
+az, gcloud, terraform, kubectl, ssh, scp and ansible-playbook. Each run
+records wall time, the number of external commands started and the peak
+RSS of the interpreter, and is compared against the stored baseline.
+Exits with status 1 if anything regressed beyond the tolerance.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, REPO_ROOT)
+FAKE_TOOLS = ("aws", "az", "gcloud", "terraform", "kubectl", "ssh", "scp", "ansible-playbook", "ansible", "command")
+
+SCALES = {
+    "small": {"nodes": 10, "resources": 100},
+    "medium": {"nodes": 500, "resources": 1000},
+    "large": {"nodes": 5000, "resources": 10000},
+}
+
+# Wall time differences below this many seconds are noise, whatever the ratio
+WALL_NOISE = 0.05
+
+def _nodes(count):
+    from fake_tool import node_ip, node_name
+    return {node_name(index): node_ip(index) for index in range(count)}
+
+def setup_inventory(workspace, scale):
+    from cli.utils.inventory import Inventory
+    inventory = Inventory.from_nodes(_nodes(scale["nodes"]), ansible_user="ubuntu",
+                                     ansible_ssh_private_key_file="/home/ubuntu/bench.pem")
+    inventory.write(os.path.join(workspace, "ansible", "inventories", "aws", "hosts"))
+
+def setup_state(workspace, scale):
+    """Write a local terraform state with the scale's resources, for the state-file fast path"""
+    path = os.path.join(workspace, "terraform", "aws", "state", "terraform.tfstate")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write('{"version":4,"serial":1,"lineage":"bench","resources":[')
+        for index in range(scale["resources"]):
+            if index:
+                file.write(",")
+            json.dump({
+                "module": f"module.m{index % 3}", "mode": "managed", "type": "aws_instance", "name": "node",
+                "instances": [{"index_key": index, "attributes": {"instance_state": "running"}}],
+            }, file)
+        file.write("]}\n")
+
+def run_inventory(workspace):
+    """Generate the inventory as run_commands does"""
+    import run_commands
+    nodes = _nodes(int(os.environ["KCD_BENCH_NODES"]))
+    run_commands.AnsibleManager("ubuntu", "/home/ubuntu/bench.pem", "aws").generate_inventory(nodes)
+
+def run_bootstrap(workspace):
+    import run_commands
+    pem = os.path.join(workspace, "bench.pem")
+    run_commands.main(["k8s-*", "bastion*", pem, "/home/ubuntu", "aws", "--no-cache"])
+
+def run_startup(workspace):
+    """Start the CLI and resolve one subcommand, as `kcdcli cluster -p aws status --help` does"""
+    from kcdcli import cli
+    cli.main(["cluster", "-p", "aws", "status", "--help"], prog_name="kcdcli", standalone_mode=False)
+
+def run_deploy(workspace):
+    from cli.commands.deploy import deploy_cluster
+    deploy_cluster("aws", fresh=True)
+
+def run_status(workspace):
+    from cli.commands.status import get_cluster_status
+    get_cluster_status("aws")
+
+# name -> (setup in the parent, unmeasured; measured function in the child)
+SCENARIOS = {
+    "startup": (None, run_startup),
+    "inventory": (None, run_inventory),
+    "bootstrap": (None, run_bootstrap),
+    "deploy": (setup_inventory, run_deploy),
+    "status": (None, run_status),
+    "status-state": (setup_state, run_status),
+}
+
+def make_workspace(scale, latency, output_bytes):
+    """Scratch copy of the repository's inputs, a bin directory of fakes and the environment to run in"""
+    workspace = tempfile.mkdtemp(prefix="kcd-bench-")
+    ignore = shutil.ignore_patterns(".terraform", "state", "*.tfstate", "*.tfplan", "inventory.json",
+                                    "kcd-*.auto.tfvars.json")
+    for name in ("ansible", "terraform"):
+        shutil.copytree(os.path.join(REPO_ROOT, name), os.path.join(workspace, name), ignore=ignore)
+    bin_dir = os.path.join(workspace, "bin")
+    os.makedirs(bin_dir)
+    for tool in FAKE_TOOLS:
+        os.symlink(os.path.join(BENCH_DIR, "fake_tool.py"), os.path.join(bin_dir, tool))
+    with open(os.path.join(workspace, "bench.pem"), "w") as file:
+        file.write("fake key\n")
+
+    env = dict(os.environ)
+    env.update({
+        "PATH": f"{bin_dir}{os.pathsep}{env.get('PATH', '')}",
+        "PYTHONPATH": REPO_ROOT,
+        "HOME": workspace,
+        "XDG_CACHE_HOME": os.path.join(workspace, ".cache"),
+        "XDG_RUNTIME_DIR": os.path.join(workspace, ".run"),
+        "KCD_BENCH_NODES": str(scale["nodes"]),
+        "KCD_BENCH_RESOURCES": str(scale["resources"]),
+        "KCD_BENCH_LATENCY": str(latency),
+        "KCD_BENCH_OUTPUT_BYTES": str(output_bytes),
+        "KCD_BENCH_CALLS": os.path.join(workspace, "calls.log"),
+    })
+    for name in ("KCD_TRACE", "KCD_ANSIBLE_PROFILE", "KCD_K8S_BACKEND", "KUBECONFIG"):
+        env.pop(name, None)
+    return workspace, env
+
+def run_scenario(scenario, scale, latency, output_bytes):
+    """Run one scenario in a child interpreter and return its measurements"""
+    setup, _ = SCENARIOS[scenario]
+    workspace, env = make_workspace(SCALES[scale], latency, output_bytes)
+    try:
+        if setup:
+            setup(workspace, SCALES[scale])
+        result_path = os.path.join(workspace, "result.json")
+        log_path = os.path.join(workspace, "output.log")
+        with open(log_path, "w") as log:
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", scenario, result_path],
+                cwd=workspace, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        try:
+            with open(result_path, "r") as file:
+                result = json.load(file)
+        except (OSError, ValueError):
+            with open(log_path, "r") as file:
+                tail = file.read()[-2000:]
+            raise Exception(f"{scenario}/{scale} exited with {process.returncode} without a result:\n{tail}")
+        return result
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+def child(scenario, result_path):
+    """Entry point of the child interpreter: run the scenario and write its measurements"""
+    _, func = SCENARIOS[scenario]
+    calls_path = os.environ["KCD_BENCH_CALLS"]
+    error = None
+    start = time.perf_counter()
+    try:
+        func(os.getcwd())
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+    try:
+        with open(calls_path, "r") as file:
+            calls = sum(1 for _ in file)
+    except OSError:
+        calls = 0
+    with open(result_path, "w") as file:
+        json.dump({
+            "wall": round(wall, 4),
+            "subprocesses": calls,
+            # ru_maxrss is in kilobytes on Linux and bytes on macOS
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1),
+            "error": error,
+        }, file)
+
+def compare(result, base, tolerance):
+    """Return the list of regressions of result against base"""
+    regressions = []
+    if result["error"]:
+        regressions.append(f"failed: {result['error']}")
+    if not base:
+        return regressions
+    if result["wall"] > base["wall"] * (1 + tolerance) and result["wall"] - base["wall"] > WALL_NOISE:
+        regressions.append(f"wall {base['wall']:.2f}s -> {result['wall']:.2f}s")
+    if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {base['peak_rss_mb']}MB -> {result['peak_rss_mb']}MB")
+    if result["subprocesses"] > base["subprocesses"]:
+        regressions.append(f"subprocesses {base['subprocesses']} -> {result['subprocesses']}")
+    return regressions
+
+def _change(value, base):
+    if not base:
+        return "new"
+    return f"{(value - base) / base:+.0%}" if base else "-"
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark the CLI orchestration paths against local fake cloud tools.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated scales ({', '.join(SCALES)})")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated scenarios ({', '.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds every fake tool call takes (default: 0.01)")
+    parser.add_argument("--output-bytes", type=int, default=0, help="Extra output every fake tool call prints")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the fastest is kept")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown or growth (default: 0.25)")
+    args = parser.parse_args()
+
+    scales = [scale for scale in args.scales.split(",") if scale]
+    scenarios = [scenario for scenario in args.scenarios.split(",") if scenario]
+    for name, known in (("scale", SCALES), ("scenario", SCENARIOS)):
+        unknown = [value for value in (scales if name == "scale" else scenarios) if value not in known]
+        if unknown:
+            parser.error(f"unknown {name} {', '.join(unknown)}, expected one of {', '.join(known)}")
+
+    settings = {"latency": args.latency, "output_bytes": args.output_bytes}
+    baseline = {}
+    try:
+        with open(args.baseline, "r") as file:
+            stored = json.load(file)
+        if stored.get("settings") == settings:
+            baseline = stored.get("results", {})
+        else:
+            print(f"Baseline was recorded with {stored.get('settings')}, not {settings}; not comparing")
+    except (OSError, ValueError):
+        print(f"No baseline at {args.baseline}")
+
+    results = {}
+    failures = {}
+    print(f"{'SCENARIO':<14} {'SCALE':<7} {'WALL':>8} {'CHANGE':>7} {'SUBPROCS':>8} {'PEAK RSS':>9}")
+    for scale in scales:
+        for scenario in scenarios:
+            key = f"{scenario}/{scale}"
+            runs = [run_scenario(scenario, scale, args.latency, args.output_bytes) for _ in range(max(1, args.repeat))]
+            result = min(runs, key=lambda run: run["wall"])
+            results[key] = result
+            base = baseline.get(key)
+            regressions = compare(result, base, args.tolerance)
+            if regressions:
+                failures[key] = regressions
+            print(f"{scenario:<14} {scale:<7} {result['wall']:>7.2f}s {_change(result['wall'], base and base['wall']):>7} "
+                  f"{result['subprocesses']:>8} {result['peak_rss_mb']:>7.1f}MB"
+                  + ("  REGRESSED" if regressions else ""))
+
+    if args.save_baseline:
+        stored = {"settings": settings, "results": dict(baseline, **results)}
+        with open(args.baseline, "w") as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if failures:
+        print("\nRegressions:")
+        for key, regressions in failures.items():
+            for regression in regressions:
+                print(f"  {key}: {regression}")
+        if not args.save_baseline:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
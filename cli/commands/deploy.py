@@ -1,26 +1,101 @@
+import os
 import click
+from cli.utils import trace
+from cli.utils.journal import TERRAFORM_CONFIG_SUFFIXES, DeployJournal, tree_fingerprint, value_fingerprint
+from cli.utils.output import echo
 from cli.utils.terraform import TerraformManager
+from cli.utils.tfstate import state_version
 from cli.utils.ansible import AnsibleManager
+from cli.utils.kubernetes import KubernetesManager
+from cli.commands.join import WaveJoiner
 
-def deploy_cluster(provider, skip_terraform=False, skip_ansible=False):
+def _phase(journal, name, fingerprint, func):
+    """Run one deploy phase through the journal, skipping it if it already completed with these inputs
+
+    fingerprint is a function, evaluated before the phase and again after
+    it for the record, since a phase may write its own inputs (terraform
+    init writes the lock file).
+    """
+    if not journal.should_run(name, fingerprint()):
+        echo(click.style(f"↷ {name}: already completed with the same inputs, skipping", fg="cyan"))
+        return
+    journal.started(name)
+    try:
+        with trace.span(name):
+            func()
+    except Exception as e:
+        journal.failed(name, e)
+        raise
+    journal.finished(name, fingerprint())
+
+def deploy_cluster(provider, skip_terraform=False, skip_ansible=False, modules=None, parallelism=None,
+                   environment=None, ansible_profile=None, join_wave_size=None, fresh=False):
     """
     Deploy the Kubernetes cluster
+
+    With join_wave_size, site.yml leaves the workers unjoined and they are
+    joined afterwards in Ready-gated waves starting at that size.
+
+    Completed phases are recorded in a journal with a fingerprint of their
+    inputs, and a re-run resumes at the first phase that did not finish or
+    whose inputs changed (fresh=True starts over). Nodes that completed
+    preparation with the current role contents skip it through a marker
+    file on the host.
     """
     try:
-        if not skip_terraform:
-            tf = TerraformManager(provider)
-            tf.init()
-            tf.plan()
-            tf.apply()
-            click.echo(click.style("✓ Terraform deployment completed", fg="green"))
+        journal = DeployJournal(provider, environment)
+        if fresh:
+            journal.reset()
+
+        with trace.span("deploy", provider=provider, environment=environment):
+            if not skip_terraform:
+                tf = TerraformManager(provider, workspace=environment, parallelism=parallelism)
+
+                def terraform_phase():
+                    tf.init()
+                    tf.ensure_workspace()
+                    # Apply exactly the plan that was just computed instead of planning twice
+                    plan_file = tf.plan(modules=modules)
+                    tf.apply(plan_file=plan_file)
+
+                def terraform_fingerprint():
+                    config = tree_fingerprint(tf.tf_dir, suffixes=TERRAFORM_CONFIG_SUFFIXES)
+                    # Any apply or destroy outside the journal bumps the state serial
+                    state = state_version(tf.local_state_path())
+                    return value_fingerprint(config, environment, sorted(modules or []), state)
+
+                _phase(journal, "terraform", terraform_fingerprint, terraform_phase)
+                echo(click.style("✓ Terraform deployment completed", fg="green"))
+
+            if not skip_ansible:
+                ansible = AnsibleManager(provider, environment, profile=ansible_profile)
+                role_fingerprint = tree_fingerprint(os.path.join(ansible.ansible_dir, "roles", "cluster_init"))
+                extra_vars = {"kcd_prepare_fingerprint": role_fingerprint}
+                if join_wave_size:
+                    extra_vars["skip_worker_join"] = True
+
+                def ansible_fingerprint():
+                    # Covers the roles, playbooks and the inventory, i.e. the node list
+                    return value_fingerprint(tree_fingerprint(ansible.ansible_dir), bool(join_wave_size))
+
+                _phase(journal, "ansible", ansible_fingerprint, lambda: ansible.run_playbook(extra_vars=extra_vars))
+                echo(click.style("✓ Ansible configuration completed", fg="green"))
+
+                if join_wave_size:
+                    def join_phase():
+                        k8s = KubernetesManager(provider, environment=environment)
+                        try:
+                            failed = WaveJoiner(ansible, k8s, wave_size=join_wave_size).run()
+                        finally:
+                            k8s.close()
+                        if failed:
+                            raise Exception(f"{len(failed)} worker(s) did not become Ready: {', '.join(sorted(failed))}")
 
-        if not skip_ansible:
-            ansible = AnsibleManager(provider)
-            ansible.run_playbook()
-            click.echo(click.style("✓ Ansible configuration completed", fg="green"))
+                    _phase(journal, "worker join", ansible_fingerprint, join_phase)
+                    echo(click.style("✓ Worker nodes joined", fg="green"))
 
-        click.echo(click.style("✓ Cluster deployment completed successfully!", fg="green"))
+            echo(click.style("✓ Cluster deployment completed successfully!", fg="green"))
 
     except Exception as e:
-        click.echo(click.style(f"Error: {str(e)}", fg="red"))
-        raise click.Abort() 
\ No newline at end of file
+        echo(click.style(f"Error: {str(e)}", fg="red"))
+        raise click.Abort()
@@ -1,14 +1,23 @@
 import click
+from cli.utils import trace
+from cli.utils.ansible import AnsibleManager
+from cli.utils.journal import DeployJournal
+from cli.utils.output import echo
 from cli.utils.terraform import TerraformManager
 
-def destroy_cluster(provider):
+def destroy_cluster(provider, environment=None):
     """
     Destroy the Kubernetes cluster
     """
     try:
-        tf = TerraformManager(provider)
-        tf.destroy()
-        click.echo(click.style("✓ Cluster destroyed successfully!", fg="green"))
+        tf = TerraformManager(provider, workspace=environment)
+        with trace.span("destroy", provider=provider, environment=environment):
+            tf.destroy()
+        # The next deploy must run every phase against the new infrastructure,
+        # without facts cached for hosts whose IPs may be handed out again
+        DeployJournal(provider, environment).reset()
+        AnsibleManager(provider, environment, profile="default").clear_fact_cache()
+        echo(click.style("✓ Cluster destroyed successfully!", fg="green"))
     except Exception as e:
-        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        echo(click.style(f"Error: {str(e)}", fg="red"))
         raise click.Abort() 
\ No newline at end of file
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from cli.utils.output import echo, prefixed
+
+PROVIDERS = ('aws', 'azure', 'gcp')
+
+def parse_target(target):
+    """
+    Split "provider[:environment]" into its parts
+
+    The environment selects the terraform workspace, the ansible inventory
+    under ansible/inventories/ and the kubeconfig, so targets never share state.
+    """
+    provider, _, environment = target.partition(':')
+    if provider not in PROVIDERS:
+        raise click.BadParameter(f"Unknown provider in target '{target}', expected one of {', '.join(PROVIDERS)}")
+    return provider, environment or None
+
+def _run_target(operation, target, **kwargs):
+    provider, environment = parse_target(target)
+    start = time.monotonic()
+    with prefixed(target):
+        try:
+            if operation == 'deploy':
+                from cli.commands.deploy import deploy_cluster
+                deploy_cluster(provider, environment=environment, **kwargs)
+            elif operation == 'status':
+                from cli.commands.status import get_cluster_status
+                get_cluster_status(provider, environment=environment, **kwargs)
+            elif operation == 'destroy':
+                from cli.commands.destroy import destroy_cluster
+                destroy_cluster(provider, environment=environment, **kwargs)
+            else:
+                raise ValueError(f"Unsupported fleet operation: {operation}")
+            error = None
+        except click.Abort:
+            # The command already printed its error with our prefix
+            error = "failed"
+        except Exception as e:
+            echo(click.style(f"Error: {str(e)}", fg="red"))
+            error = str(e)
+    return target, error, time.monotonic() - start
+
+def run_fleet(operation, targets, max_workers=4, **kwargs):
+    """
+    Run one operation over many clusters with a bounded worker pool
+
+    Output from each target is streamed with a [target] prefix as it is
+    produced, and a summary table with per-target durations is printed at
+    the end. Returns the number of failed targets.
+    """
+    targets = list(dict.fromkeys(targets))
+    for target in targets:
+        parse_target(target)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda t: _run_target(operation, t, **kwargs), targets))
+    total = time.monotonic() - start
+
+    width = max(len("TARGET"), *(len(t) for t in targets))
+    click.echo(f"\n=== Fleet {operation} summary ===")
+    click.echo(f"{'TARGET'.ljust(width)}  {'RESULT':<8}  {'DURATION':>9}")
+    for target, error, duration in results:
+        result = click.style(f"{'ok' if error is None else 'failed':<8}", fg="green" if error is None else "red")
+        click.echo(f"{target.ljust(width)}  {result}  {duration:8.1f}s")
+    failed = sum(1 for _, error, _ in results if error is not None)
+    click.echo(f"\n{len(targets) - failed}/{len(targets)} succeeded in {total:.1f}s "
+               f"(sequential total {sum(d for _, _, d in results):.1f}s)")
+    return failed
@@ -0,0 +1,161 @@
+import time
+import click
+from cli.utils.output import echo
+from cli.utils.ansible import AnsibleManager
+from cli.utils.kubernetes import KubernetesManager
+
+JOIN_PLAYBOOK = "join.yml"
+
+class WaveJoiner:
+    """
+    Join worker nodes in waves instead of all at once
+
+    Each wave runs join.yml against a slice of the workers, then waits until
+    those nodes report Ready before the next wave starts, so the API server
+    and etcd only ever see one wave of kubeadm joins and TLS bootstraps.
+    Waves double in size after a clean wave (up to max_wave_size) and halve
+    after a failed one. Nodes that did not register are joined again up to
+    `retries` times; nodes that registered are only waited on.
+    """
+
+    def __init__(self, ansible, k8s, wave_size=5, max_wave_size=50, retries=2, ready_timeout=600,
+                 poll_interval=5, prepare=False, extra_vars=None):
+        self.ansible = ansible
+        self.k8s = k8s
+        self.wave_size = max(1, wave_size)
+        self.max_wave_size = max(self.wave_size, max_wave_size)
+        self.retries = retries
+        self.ready_timeout = ready_timeout
+        self.poll_interval = poll_interval
+        self.extra_vars = dict(extra_vars or {})
+        if prepare:
+            self.extra_vars["prepare_workers"] = True
+        # node -> (host, seconds from the start of its wave to Ready, or None, attempts)
+        self.results = {}
+
+    def workers(self, hosts=None):
+        """Return [(host, node name)] for the inventory's workers, optionally only these hosts"""
+        inventory = self.ansible.inventory()
+        hostvars = inventory.get("_meta", {}).get("hostvars", {})
+        workers = []
+        for host in inventory.get("worker", {}).get("hosts", []):
+            if hosts is None or host in hosts:
+                workers.append((host, hostvars.get(host, {}).get("node_name", host)))
+        return workers
+
+    def node_status(self):
+        """Return {node name: status} for every registered node"""
+        return {node['name']: node['status'] for node in self.k8s.get_nodes()}
+
+    def _join(self, hosts):
+        """Run join.yml for the master plus these workers; False if the playbook failed"""
+        try:
+            # run_playbook adds the master to the limit
+            self.ansible.run_playbook(
+                extra_vars=self.extra_vars or None,
+                limit=",".join(hosts),
+                playbook=JOIN_PLAYBOOK
+            )
+            return True
+        except Exception as e:
+            echo(click.style(f"  join failed for part of the wave: {str(e)}", fg="yellow"))
+            return False
+
+    def _wait_ready(self, nodes, started):
+        """Poll until every node in nodes is Ready or the timeout passes; return {node: latency}"""
+        ready = {}
+        deadline = time.monotonic() + self.ready_timeout
+        while True:
+            status = self.node_status()
+            for node in nodes - ready.keys():
+                if status.get(node) == "Ready":
+                    ready[node] = time.monotonic() - started
+                    echo(f"  • {node}: {click.style('Ready', fg='green')} after {ready[node]:.1f}s")
+            if len(ready) == len(nodes) or time.monotonic() >= deadline:
+                return ready
+            time.sleep(self.poll_interval)
+
+    def join_wave(self, wave):
+        """Join one wave of (host, node) pairs, retrying nodes that never registered"""
+        started = time.monotonic()
+        pending = list(wave)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                echo(f"  retry {attempt}/{self.retries}: {', '.join(node for _, node in pending)}")
+            self._join([host for host, _ in pending])
+
+            # kubeadm join returns once the node is registered, so anything
+            # missing now failed to join; anything present only needs time
+            status = self.node_status()
+            registered = {node for _, node in pending if node in status}
+            ready = self._wait_ready(registered, started)
+            for host, node in pending:
+                if node in registered:
+                    self.results[node] = (host, ready.get(node), attempt + 1)
+
+            pending = [(host, node) for host, node in pending if node not in registered]
+            if not pending:
+                break
+
+        for host, node in pending:
+            self.results[node] = (host, None, self.retries + 1)
+        return all(self.results[node][1] is not None for _, node in wave)
+
+    def run(self, hosts=None):
+        """Join every worker not yet registered; return the names of the nodes that failed"""
+        status = self.node_status()
+        workers = [(host, node) for host, node in self.workers(hosts) if node not in status]
+        if not workers:
+            echo("All workers are already registered")
+            return []
+
+        echo(f"Joining {len(workers)} workers, starting with waves of {self.wave_size}")
+        start = time.monotonic()
+        size = self.wave_size
+        index = 0
+        wave_number = 0
+        while index < len(workers):
+            wave = workers[index:index + size]
+            index += len(wave)
+            wave_number += 1
+            echo(f"\nWave {wave_number} ({len(wave)} nodes, {index}/{len(workers)}):")
+            if self.join_wave(wave):
+                size = min(size * 2, self.max_wave_size)
+            else:
+                size = max(1, size // 2)
+
+        self.report(time.monotonic() - start)
+        return [node for node, (_, latency, _) in self.results.items() if latency is None]
+
+    def report(self, total):
+        """Print per-node join latency"""
+        width = max(len("NODE"), *(len(node) for node in self.results))
+        echo(f"\n=== Worker join summary ({total:.1f}s) ===")
+        echo(f"{'NODE'.ljust(width)}  {'HOST':<15}  {'ATTEMPTS':>8}  {'READY AFTER':>11}")
+        for node, (host, latency, attempts) in sorted(self.results.items()):
+            result = click.style(f"{latency:10.1f}s", fg="green") if latency is not None else click.style(f"{'failed':>11}", fg="red")
+            echo(f"{node.ljust(width)}  {host:<15}  {attempts:>8}  {result}")
+        latencies = sorted(latency for _, latency, _ in self.results.values() if latency is not None)
+        if latencies:
+            echo(f"\n{len(latencies)}/{len(self.results)} Ready; median {latencies[len(latencies) // 2]:.1f}s, "
+                 f"slowest {latencies[-1]:.1f}s")
+
+def join_workers(provider, environment=None, wave_size=5, max_wave_size=50, retries=2, ready_timeout=600,
+                 hosts=None, prepare=False, ansible_profile=None):
+    """
+    Join the cluster's worker nodes in Ready-gated waves
+    """
+    k8s = KubernetesManager(provider, environment=environment)
+    try:
+        ansible = AnsibleManager(provider, environment, profile=ansible_profile)
+        joiner = WaveJoiner(ansible, k8s, wave_size=wave_size, max_wave_size=max_wave_size, retries=retries,
+                            ready_timeout=ready_timeout, prepare=prepare)
+        failed = joiner.run(hosts)
+        if failed:
+            raise Exception(f"{len(failed)} worker(s) did not become Ready: {', '.join(sorted(failed))}")
+        echo(click.style("✓ Worker nodes joined", fg="green"))
+    except Exception as e:
+        echo(click.style(f"Error: {str(e)}", fg="red"))
+        raise click.Abort()
+    finally:
+        k8s.close()
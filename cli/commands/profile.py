@@ -0,0 +1,57 @@
+import click
+from cli.utils import trace
+
+def _duration(event):
+    return event["dur"] / 1e6
+
+def _print_chain(nodes, total, depth, max_depth):
+    for node in trace.critical_path(nodes):
+        event = node["event"]
+        share = 100 * _duration(event) / total if total else 0
+        click.echo(f"{'  ' * depth}  {_duration(event):8.1f}s {share:5.1f}%  [{event['cat']}] {event['name']}")
+        if node["children"] and depth + 1 < max_depth:
+            _print_chain(node["children"], total, depth + 1, max_depth)
+
+def _self_times(nodes, out):
+    for node in nodes:
+        children = sum(_duration(child["event"]) for child in node["children"])
+        out.append((max(0.0, _duration(node["event"]) - children), node["event"]))
+        _self_times(node["children"], out)
+    return out
+
+def profile_trace(path, top=10, depth=4):
+    """
+    Summarise a trace written with --trace
+
+    Prints the critical path (the chain of spans that decided the total
+    run time, nested down to depth levels), the spans with the most time
+    not covered by their children, and the total time per category.
+    """
+    try:
+        events = trace.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        click.echo(click.style(f"Error: cannot read trace {path}: {str(e)}", fg="red"))
+        raise click.Abort()
+    if not events:
+        click.echo("Trace contains no spans")
+        return
+
+    begin = min(event["ts"] for event in events)
+    end = max(event["ts"] + event["dur"] for event in events)
+    total = (end - begin) / 1e6
+    roots = trace.build_tree(events)
+
+    click.echo(f"Trace {path}: {len(events)} spans over {total:.1f}s")
+    click.echo("\nCritical path:")
+    _print_chain(roots, total, 0, depth)
+
+    click.echo(f"\nTop {top} spans by self time:")
+    for self_time, event in sorted(_self_times(roots, []), key=lambda item: -item[0])[:top]:
+        click.echo(f"  {self_time:8.1f}s  [{event['cat']}] {event['name']}")
+
+    by_category = {}
+    for event in events:
+        by_category[event["cat"]] = by_category.get(event["cat"], 0) + _duration(event)
+    click.echo("\nTime per category (overlapping spans counted separately):")
+    for category, seconds in sorted(by_category.items(), key=lambda item: -item[1]):
+        click.echo(f"  {seconds:8.1f}s  {category}")
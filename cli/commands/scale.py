@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import click
+from cli.utils.output import echo
+from cli.utils.terraform import TerraformManager
+from cli.utils.ansible import AnsibleManager
+from cli.utils.kubernetes import KubernetesManager
+from cli.utils.journal import tree_fingerprint
+from cli.commands.join import WaveJoiner
+
+_WORKER_ADDRESS = re.compile(r'^module\.ec2_instances\.aws_instance\.worker\[(\d+)\]$')
+# Terraform loads *.auto.tfvars.json on its own, so later plans keep the new count
+SCALE_TFVARS = "kcd-scale.auto.tfvars.json"
+# Holds only the master and the workers being added, next to the main inventory
+SCALE_INVENTORY = "scale-hosts"
+# Inventory variables carried over when the inventory is rewritten
+_HOST_VARS = ("node_name", "control_plane")
+
+def worker_name(index):
+    """Node name of aws_instance.worker[index], matching its Name tag"""
+    return f"k8s-worker-{index + 1}"
+
+def _worker_indexes(tf):
+    indexes = set()
+    for address in tf.get_status():
+        match = _WORKER_ADDRESS.match(address)
+        if match:
+            indexes.add(int(match.group(1)))
+    return indexes
+
+def _host_vars(variables):
+    return {key: value for key, value in variables.items() if key.startswith("ansible_") or key in _HOST_VARS}
+
+def scale_workers(provider, workers, environment=None, wave_size=5, drain_timeout=300, ansible_profile=None,
+                  auto_approve=False):
+    """
+    Change the number of worker nodes, touching only the nodes that change
+
+    Removed workers (the highest indexes, as terraform drops them) are
+    cordoned and drained first. Only module.ec2_instances is planned and
+    applied, the new workers are found by diffing the state before and
+    after, and only they are prepared and joined, through an inventory
+    holding just them and the master.
+    """
+    if provider != "aws":
+        raise click.BadParameter(f"Scaling is only supported for aws, not {provider}")
+
+    k8s = KubernetesManager(provider, environment=environment)
+    try:
+        tf = TerraformManager(provider, workspace=environment)
+        ansible = AnsibleManager(provider, environment, profile=ansible_profile)
+        tf.init()
+        tf.ensure_workspace()
+
+        before = _worker_indexes(tf)
+        if workers == len(before):
+            echo(f"Cluster already has {workers} workers, nothing to do")
+            return
+
+        removed = sorted(index for index in before if index >= workers)
+        if removed:
+            names = [worker_name(index) for index in removed]
+            if not auto_approve and not click.confirm(f"Remove {', '.join(names)}?"):
+                return
+            for name in names:
+                echo(f"Draining {name}...")
+                k8s.cordon(name)
+                k8s.drain(name, timeout=drain_timeout)
+
+        echo(f"Scaling workers from {len(before)} to {workers}...")
+        with open(os.path.join(tf.tf_dir, SCALE_TFVARS), 'w') as file:
+            json.dump({"worker_count": workers}, file, indent=2)
+        plan_file = tf.plan(modules=["ec2_instances"])
+        tf.apply(plan_file=plan_file)
+
+        after = _worker_indexes(tf)
+        added = sorted(after - before)
+        worker_ips = tf.output().get("Worker_Node_IPs") or []
+
+        # Rewrite the main inventory from the new worker list
+        inventory = ansible.inventory()
+        hostvars = inventory.get("_meta", {}).get("hostvars", {})
+        masters = {host: _host_vars(hostvars.get(host, {})) for host in inventory.get("master", {}).get("hosts", [])}
+        if not masters:
+            raise Exception(f"No master in {ansible.inventory_file}")
+        connection = {key: value for key, value in next(iter(masters.values())).items() if key.startswith("ansible_")}
+        worker_hosts = {
+            worker_ips[index]: dict(connection, node_name=worker_name(index), control_plane="no")
+            for index in sorted(after) if index < len(worker_ips)
+        }
+        ansible.write_inventory({"master": masters, "worker": worker_hosts})
+
+        for index in removed:
+            k8s.delete_node(worker_name(index))
+        echo(click.style(f"✓ Infrastructure scaled to {workers} workers", fg="green"))
+
+        if added:
+            new_hosts = {worker_ips[index]: worker_hosts[worker_ips[index]] for index in added if index < len(worker_ips)}
+            scale_inventory = os.path.join(os.path.dirname(ansible.inventory_file), SCALE_INVENTORY)
+            ansible.write_inventory({"master": masters, "worker": new_hosts}, scale_inventory)
+            incremental = AnsibleManager(provider, environment, profile=ansible_profile,
+                                         inventory_file=scale_inventory)
+            role_fingerprint = tree_fingerprint(os.path.join(ansible.ansible_dir, "roles", "cluster_init"))
+            joiner = WaveJoiner(incremental, k8s, wave_size=wave_size, prepare=True,
+                                extra_vars={"kcd_prepare_fingerprint": role_fingerprint})
+            failed = joiner.run()
+            if failed:
+                raise Exception(f"{len(failed)} worker(s) did not become Ready: {', '.join(sorted(failed))}")
+            echo(click.style(f"✓ {len(new_hosts)} new worker(s) joined", fg="green"))
+    except Exception as e:
+        echo(click.style(f"Error: {str(e)}", fg="red"))
+        raise click.Abort()
+    finally:
+        k8s.close()
@@ -1,60 +1,162 @@
 import click
 import subprocess
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cli.utils.output import echo
 from cli.utils.terraform import TerraformManager
 from cli.utils.kubernetes import KubernetesManager
 
-def get_cluster_status(provider):
+# Seconds a single probe may take before it is reported as failed
+PROBE_TIMEOUT = 20
+# Oldest health agent snapshot status accepts, in seconds
+SNAPSHOT_MAX_AGE = int(os.getenv("KCD_STATUS_MAX_AGE", "30"))
+
+def _render_infrastructure(tf_status):
+    echo("\n🏗️  Infrastructure:")
+    for resource, state in tf_status.items():
+        color = "green" if state == "running" else "yellow" if state == "pending" else "red"
+        echo(f"  • {resource}: {click.style(state, fg=color)}")
+
+def _render_nodes(nodes):
+    echo("\n  Nodes:")
+    for node in nodes:
+        status = node['status']
+        color = "green" if status == "Ready" else "red"
+        echo(f"  • {node['name']}: {click.style(status, fg=color)}")
+
+def _render_pods(pods):
+    echo("\n  System Pods:")
+    for pod in pods:
+        status = pod['status']
+        color = "green" if status == "Running" else "yellow" if status == "Pending" else "red"
+        echo(f"  • {pod['name']}: {click.style(status, fg=color)}")
+
+def _render_components(components):
+    echo("\n  Components:")
+    for component in components:
+        status = component['status']
+        color = "green" if status == "Healthy" else "red"
+        echo(f"  • {component['name']}: {click.style(status, fg=color)}")
+
+def _render_snapshot(snapshot):
+    """Print a health agent snapshot the way the live probes are printed"""
+    data, errors = snapshot["data"], snapshot["errors"]
+    echo(f"\nSnapshot from the health agent, {time.time() - snapshot['taken']:.0f}s old")
+    if "infrastructure" in errors:
+        echo(click.style(f"\n  Infrastructure: {errors['infrastructure']}", fg="red"))
+    else:
+        _render_infrastructure(data["infrastructure"])
+
+    if not data.get("cluster_info"):
+        echo("\n❌ Kubernetes cluster is not accessible")
+        return
+    echo("\n🚀 Kubernetes:")
+    for section, title, render in (("nodes", "Nodes", _render_nodes), ("pods", "System Pods", _render_pods),
+                                   ("components", "Components", _render_components)):
+        if section in errors:
+            echo(click.style(f"\n  {title}: {errors[section]}", fg="red"))
+        else:
+            render(data.get(section, []))
+
+def get_cluster_status(provider, timeout=PROBE_TIMEOUT, environment=None, max_age=SNAPSHOT_MAX_AGE, use_agent=True):
     """
     Get the status of the Kubernetes cluster
+
+    If a health agent is serving this cluster, its snapshot is printed as
+    long as it is at most max_age seconds old. Otherwise every probe runs
+    concurrently and each section is printed as soon as its data arrives,
+    so one slow or hung call only delays its own section.
     """
+    if use_agent:
+        from cli.utils.agent import query
+        snapshot = query(provider, environment, max_age=max_age, timeout=timeout + 5)
+        if snapshot:
+            echo("\n=== Cluster Status ===")
+            echo(f"\nProvider: {click.style(provider.upper(), fg='blue')}")
+            _render_snapshot(snapshot)
+            return
+
+    tf = TerraformManager(provider, workspace=environment)
+    k8s = KubernetesManager(provider, timeout=timeout, environment=environment)
     try:
-        # Get infrastructure status
-        tf = TerraformManager(provider)
-        tf_status = tf.get_status()
-        
-        # Get Kubernetes cluster status
-        k8s = KubernetesManager(provider)
-        
-        click.echo("\n=== Cluster Status ===")
-        click.echo(f"\nProvider: {click.style(provider.upper(), fg='blue')}")
-        
-        # Infrastructure Status
-        click.echo("\n🏗️  Infrastructure:")
-        for resource, state in tf_status.items():
-            color = "green" if state == "running" else "yellow" if state == "pending" else "red"
-            click.echo(f"  • {resource}: {click.style(state, fg=color)}")
-        
-        # Kubernetes Status
-        if k8s.is_available():
-            click.echo("\n🚀 Kubernetes:")
-            
-            # Node Status
-            nodes = k8s.get_nodes()
-            click.echo("\n  Nodes:")
-            for node in nodes:
-                status = node['status']
-                color = "green" if status == "Ready" else "red"
-                click.echo(f"  • {node['name']}: {click.style(status, fg=color)}")
-            
-            # Pod Status
-            pods = k8s.get_pods()
-            click.echo("\n  System Pods:")
-            for pod in pods:
-                status = pod['status']
-                color = "green" if status == "Running" else "yellow" if status == "Pending" else "red"
-                click.echo(f"  • {pod['name']}: {click.style(status, fg=color)}")
-            
-            # Component Status
-            components = k8s.get_component_status()
-            click.echo("\n  Components:")
-            for component in components:
-                status = component['status']
-                color = "green" if status == "Healthy" else "red"
-                click.echo(f"  • {component['name']}: {click.style(status, fg=color)}")
-        else:
-            click.echo("\n❌ Kubernetes cluster is not accessible")
-            
+        echo("\n=== Cluster Status ===")
+        echo(f"\nProvider: {click.style(provider.upper(), fg='blue')}")
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            probes = {
+                executor.submit(tf.get_status, timeout): ("Infrastructure", _render_infrastructure, False),
+                executor.submit(k8s.is_available): ("Cluster info", None, True),
+                executor.submit(k8s.get_nodes): ("Nodes", _render_nodes, True),
+                executor.submit(k8s.get_pods): ("System Pods", _render_pods, True),
+                executor.submit(k8s.get_component_status): ("Components", _render_components, True),
+            }
+
+            k8s_header_shown = False
+            k8s_unavailable = False
+            for future in as_completed(probes):
+                section, render, is_k8s = probes[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    if not (is_k8s and k8s_unavailable):
+                        echo(click.style(f"\n  {section}: {str(e)}", fg="red"))
+                    continue
+
+                if render is None:
+                    if not data:
+                        k8s_unavailable = True
+                        echo("\n❌ Kubernetes cluster is not accessible")
+                    continue
+
+                if is_k8s and not k8s_header_shown:
+                    echo("\n🚀 Kubernetes:")
+                    k8s_header_shown = True
+                render(data)
+
+    except Exception as e:
+        echo(click.style(f"\nError getting cluster status: {str(e)}", fg="red"))
+        raise click.Abort()
+    finally:
+        k8s.close()
+
+def watch_cluster_status(provider, timeout=PROBE_TIMEOUT):
+    """
+    Follow node and system pod status live
+
+    Lists nodes and kube-system pods once, then applies watch events to an
+    in-memory index and prints only the entries that changed.
+    """
+    from cli.utils.kube_watch import ClusterWatcher
+
+    k8s = KubernetesManager(provider, timeout=timeout, backend="api")
+    watcher = ClusterWatcher(k8s.api)
+    try:
+        watcher.start()
+        echo("\n=== Cluster Status (watching, Ctrl-C to stop) ===")
+        echo(f"\nProvider: {click.style(provider.upper(), fg='blue')}")
+        echo("\n🚀 Kubernetes:")
+        _render_nodes([{'name': n, 'status': s} for n, s in sorted(watcher.index["node"].items())])
+        _render_pods([{'name': n, 'status': s} for n, s in sorted(watcher.index["pod"].items())])
+        echo("\n  Changes:")
+
+        while True:
+            kind, name, old, new = watcher.changes.get()
+            if name is None:
+                echo(click.style(f"  ! {kind} watch interrupted: {new}", fg="yellow"))
+                continue
+            if new is None:
+                echo(f"  - {kind} {name} deleted")
+                continue
+            healthy = new in ("Ready", "Running", "Succeeded")
+            before = f"{old} → " if old else "added "
+            echo(f"  ~ {kind} {name}: {before}{click.style(new, fg='green' if healthy else 'red')}")
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
-        click.echo(click.style(f"\nError getting cluster status: {str(e)}", fg="red"))
-        raise click.Abort() 
\ No newline at end of file
+        echo(click.style(f"\nError watching cluster status: {str(e)}", fg="red"))
+        raise click.Abort()
+    finally:
+        watcher.stop()
+        k8s.close()
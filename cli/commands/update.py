@@ -1,4 +1,6 @@
 import click
+from cli.utils import trace
+from cli.utils.output import echo
 from cli.utils.terraform import TerraformManager
 from cli.utils.ansible import AnsibleManager
 
@@ -8,17 +10,21 @@ def update_cluster(provider):
     """
     try:
         tf = TerraformManager(provider)
-        tf.plan()
+        with trace.span("plan", provider=provider):
+            plan_file = tf.plan()
         
         if click.confirm("Do you want to apply the changes?"):
-            tf.apply()
-            click.echo(click.style("✓ Infrastructure updated", fg="green"))
+            # Apply the plan that was just reviewed, not a fresh one
+            with trace.span("apply", provider=provider):
+                tf.apply(plan_file=plan_file)
+            echo(click.style("✓ Infrastructure updated", fg="green"))
             
             ansible = AnsibleManager(provider)
-            ansible.run_playbook()
-            click.echo(click.style("✓ Configuration updated", fg="green"))
+            with trace.span("ansible", provider=provider):
+                ansible.run_playbook()
+            echo(click.style("✓ Configuration updated", fg="green"))
             
-        click.echo(click.style("✓ Cluster update completed!", fg="green"))
+        echo(click.style("✓ Cluster update completed!", fg="green"))
     except Exception as e:
-        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        echo(click.style(f"Error: {str(e)}", fg="red"))
         raise click.Abort() 
\ No newline at end of file
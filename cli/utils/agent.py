@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cli.utils.terraform import TerraformManager
+from cli.utils.kubernetes import KubernetesManager
+
+def socket_path(provider, environment=None):
+    """Unix socket of the health agent for one cluster of this working tree"""
+    base = os.getenv("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"kcdcli-{os.getuid()}")
+    # Terraform and kubeconfig paths are relative to the working tree, so two
+    # checkouts of the same cluster name get separate agents. Unix socket
+    # paths are limited to ~104 chars, hence the short hash.
+    tree = hashlib.sha256(os.getcwd().encode()).hexdigest()[:8]
+    name = f"{provider}-{environment}" if environment else provider
+    return os.path.join(base, "kcdcli", f"agent-{name}-{tree}.sock")
+
+def query(provider, environment=None, max_age=30, timeout=30):
+    """Return a snapshot no older than max_age seconds from a running agent, or None if none answers"""
+    path = socket_path(provider, environment)
+    if not os.path.exists(path):
+        return None
+    asked = time.time()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps({"max_age": max_age}).encode() + b"\n")
+            with sock.makefile("rb") as reply:
+                response = json.loads(reply.readline())
+    except (OSError, ValueError):
+        return None
+    snapshot = response.get("snapshot")
+    if not snapshot or snapshot["taken"] < asked - max_age:
+        return None
+    return snapshot
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # A connection check, e.g. from _claim_socket
+            return
+        try:
+            request = json.loads(line)
+            response = {"snapshot": self.server.agent.get(float(request.get("max_age", self.server.agent.interval)))}
+        except Exception as e:
+            response = {"error": str(e)}
+        try:
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+        except OSError:
+            # The caller gave up waiting and probes the cluster itself
+            pass
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class HealthAgent:
+    """
+    Keep a status snapshot of one cluster and serve it over a Unix socket
+
+    The snapshot holds the same probes `cluster status` runs and is
+    refreshed every `interval` seconds. A caller asking for something
+    fresher than the current snapshot triggers one refresh that every
+    concurrent caller shares, so any number of status calls cost at most
+    one set of probes per refresh. With watch, nodes and system pods are
+    followed through API watch streams instead of being listed again.
+    """
+
+    def __init__(self, provider, environment=None, interval=15, timeout=20, watch=False):
+        self.provider = provider
+        self.environment = environment
+        self.interval = interval
+        self.path = socket_path(provider, environment)
+        self.tf = TerraformManager(provider, workspace=environment)
+        self.k8s = KubernetesManager(provider, timeout=timeout, environment=environment,
+                                     backend="api" if watch else None)
+        self.timeout = timeout
+        self.watcher = None
+        if watch:
+            from cli.utils.kube_watch import ClusterWatcher
+            self.watcher = ClusterWatcher(self.k8s.api)
+        self.snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+
+    def probe(self):
+        """Run every probe concurrently and return a snapshot"""
+        probes = {
+            "infrastructure": lambda: self.tf.get_status(self.timeout),
+            "cluster_info": self.k8s.is_available,
+            "components": self.k8s.get_component_status,
+        }
+        if self.watcher is None:
+            probes["nodes"] = self.k8s.get_nodes
+            probes["pods"] = self.k8s.get_pods
+        taken = time.time()
+        snapshot = {"taken": taken, "data": {}, "errors": {}}
+        with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+            futures = {section: executor.submit(probe) for section, probe in probes.items()}
+            for section, future in futures.items():
+                try:
+                    snapshot["data"][section] = future.result()
+                except Exception as e:
+                    snapshot["errors"][section] = str(e)
+        snapshot["duration"] = time.time() - taken
+        return snapshot
+
+    def refresh(self, max_age=None):
+        """Refresh the snapshot unless another caller did while we waited; return it"""
+        with self._refresh_lock:
+            snapshot = self.snapshot
+            if max_age is None or snapshot is None or time.time() - snapshot["taken"] > max_age:
+                self.snapshot = snapshot = self.probe()
+            return snapshot
+
+    def get(self, max_age):
+        """Return a snapshot no older than max_age, refreshing it if needed"""
+        snapshot = self.snapshot
+        if snapshot is None or time.time() - snapshot["taken"] > max_age:
+            snapshot = self.refresh(max_age)
+        if self.watcher is not None:
+            # Watched sections are live, whatever the age of the rest
+            snapshot = dict(snapshot, data=dict(snapshot["data"]))
+            for section, kind in (("nodes", "node"), ("pods", "pod")):
+                snapshot["data"][section] = [
+                    {"name": name, "status": status} for name, status in sorted(self.watcher.index[kind].items())
+                ]
+        return snapshot
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                # A failed probe round leaves the previous snapshot in place
+                pass
+            self._stop.wait(self.interval)
+
+    def _claim_socket(self):
+        """Remove a socket left behind by an agent that is gone; fail if one is still answering"""
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if not os.path.exists(self.path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+                return
+        raise Exception(f"A health agent is already serving {self.path}")
+
+    def serve_forever(self):
+        """Serve snapshots until stop() is called or the process is interrupted"""
+        self._claim_socket()
+        if self.watcher is not None:
+            self.watcher.start()
+        self._server = _Server(self.path, _Handler)
+        self._server.agent = self
+        threading.Thread(target=self._refresh_loop, name="kcd-agent-refresh", daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            if self.watcher is not None:
+                self.watcher.stop()
+            self.k8s.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
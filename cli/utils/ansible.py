@@ -1,45 +1,240 @@
+import hashlib
+import json
 import os
+import shutil
 import subprocess
-import click
+import tempfile
+from cli.utils import trace
+from cli.utils.inventory import Inventory
+from cli.utils.kubernetes import kubeconfig_path
+from cli.utils.output import echo, run
+
+# Performance profiles for ansible-playbook. Forks scale with the inventory
+# size up to max_forks; worker_strategy becomes the default strategy, which
+# only the worker play uses since the master play pins its own.
+PERFORMANCE_PROFILES = {
+    "default": {},
+    "fast": {
+        "max_forks": 50,
+        "pipelining": True,
+        "control_persist": "120s",
+        "fact_cache_timeout": 3600,
+        "worker_strategy": "linear",
+    },
+    "scale": {
+        "max_forks": 200,
+        "pipelining": True,
+        "control_persist": "600s",
+        "fact_cache_timeout": 86400,
+        "worker_strategy": "free",
+    },
+}
+
+def with_master(limit):
+    """Add the master group to a --limit, since workers join with a fact the master play sets"""
+    if limit is None:
+        return None
+    patterns = [pattern for pattern in limit.split(",") if pattern]
+    if "master" in patterns:
+        return limit
+    return ",".join(["master"] + patterns)
 
 class AnsibleManager:
-    def __init__(self, provider):
+    def __init__(self, provider, environment=None, profile=None, inventory_file=None):
         self.provider = provider
+        self.environment = environment
         self.ansible_dir = "ansible"
-        self.inventory_file = f"inventory/{provider}/hosts.yml"
+        if inventory_file:
+            self.inventory_file = inventory_file
+        elif environment:
+            self.inventory_file = f"inventories/{environment}/hosts"
+        else:
+            self.inventory_file = f"inventories/{provider}/hosts"
         self.extra_vars = {}
+        self.profile = profile or os.getenv("KCD_ANSIBLE_PROFILE", "default")
+        if self.profile not in PERFORMANCE_PROFILES:
+            raise Exception(f"Unknown Ansible profile '{self.profile}', expected one of {', '.join(PERFORMANCE_PROFILES)}")
+
+    def inventory_hosts(self):
+        """List the hosts in the inventory"""
+        path = os.path.join(self.ansible_dir, self.inventory_file)
+        if not os.path.isfile(path):
+            return []
+        return list(self.inventory().get("_meta", {}).get("hostvars", {}))
+
+    def write_inventory(self, groups, inventory_file=None):
+        """Write {group: {host: {var: value}}} as an INI inventory (default: this manager's inventory)"""
+        inventory = Inventory()
+        for group, hosts in groups.items():
+            inventory.groups.setdefault(group, [])
+            for host, variables in hosts.items():
+                inventory.add_host(host, [group], **variables)
+        return inventory.write(os.path.join(self.ansible_dir, inventory_file or self.inventory_file), fmt="ini")
+
+    def inventory(self):
+        """Return the inventory as `ansible-inventory --list` JSON (groups and hostvars)
+
+        INI and JSON inventories are read directly; anything else, such as
+        YAML or a dynamic inventory script, goes through ansible-inventory.
+        """
+        path = os.path.join(self.ansible_dir, self.inventory_file)
+        if os.path.isfile(path) and not path.endswith((".yml", ".yaml", ".py")) and not os.access(path, os.X_OK):
+            return Inventory.load(path).to_dict()
+        result = subprocess.run(
+            ["ansible-inventory", "-i", self.inventory_file, "--list"],
+            cwd=self.ansible_dir,
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return json.loads(result.stdout)
+
+    def list_hosts(self, pattern):
+        """Resolve a host pattern (group, host list, wildcard) to hosts using ansible itself"""
+        result = subprocess.run(
+            ["ansible", pattern, "-i", self.inventory_file, "--list-hosts"],
+            cwd=self.ansible_dir,
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        # First line is the "hosts (N):" header
+        return [line.strip() for line in result.stdout.splitlines()[1:] if line.strip()]
+
+    def fact_cache_dir(self):
+        """Fact cache of this manager's inventory
+
+        Facts are keyed by inventory hostname, a private IP here, so each
+        inventory (environment, working tree) gets its own directory.
+        """
+        inventory = hashlib.sha256(os.path.abspath(os.path.join(self.ansible_dir, self.inventory_file)).encode())
+        return os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "kcdcli", "ansible-facts",
+                            f"{self.provider}-{inventory.hexdigest()[:12]}")
+
+    def clear_fact_cache(self):
+        """Forget cached facts, e.g. once the cluster is destroyed and its IPs may be reused"""
+        shutil.rmtree(self.fact_cache_dir(), ignore_errors=True)
+
+    def profile_env(self, host_count=None):
+        """Return the ANSIBLE_* settings of the selected profile"""
+        profile = PERFORMANCE_PROFILES[self.profile]
+        if not profile:
+            return {}
+        if host_count is None:
+            host_count = len(self.inventory_hosts())
+        fact_cache = self.fact_cache_dir()
+        settings = {
+            "ANSIBLE_FORKS": str(max(5, min(host_count, profile["max_forks"]))),
+            "ANSIBLE_PIPELINING": "True" if profile["pipelining"] else "False",
+            "ANSIBLE_SSH_ARGS": f"-o ControlMaster=auto -o ControlPersist={profile['control_persist']}",
+            "ANSIBLE_GATHERING": "smart",
+            "ANSIBLE_CACHE_PLUGIN": "jsonfile",
+            "ANSIBLE_CACHE_PLUGIN_CONNECTION": fact_cache,
+            "ANSIBLE_CACHE_PLUGIN_TIMEOUT": str(profile["fact_cache_timeout"]),
+            "ANSIBLE_STRATEGY": profile["worker_strategy"],
+            "ANSIBLE_CALLBACKS_ENABLED": "profile_tasks",
+        }
+        # Use mitogen's strategies when it is installed
+        try:
+            import ansible_mitogen
+            settings["ANSIBLE_STRATEGY_PLUGINS"] = os.path.join(os.path.dirname(ansible_mitogen.__file__), "plugins", "strategy")
+            settings["ANSIBLE_STRATEGY"] = f"mitogen_{profile['worker_strategy']}"
+        except ImportError:
+            pass
+        return settings
 
-    def run_playbook(self, extra_vars=None, tags=None):
-        """Run Ansible playbook"""
-        click.echo("Running Ansible playbook...")
+    def run_playbook(self, extra_vars=None, tags=None, limit=None, batch_size=None, playbook="site.yml"):
+        """Run Ansible playbook
+
+        With batch_size, the hosts (or the ones matched by limit) are
+        processed in consecutive --limit batches for rolling work. Every
+        limit and batch also includes the master group, since the worker
+        join reads the join command from the master's facts.
+        extra_vars is either a vars file or a dict of variables.
+        """
+        echo("Running Ansible playbook...")
+        hosts = self.inventory_hosts() if (batch_size or PERFORMANCE_PROFILES[self.profile]) else []
+        settings = self.profile_env(len(hosts))
+        if settings:
+            echo(f"Ansible profile '{self.profile}' ({len(hosts)} hosts):")
+            for key, value in sorted(settings.items()):
+                echo(f"  {key}={value}")
+            os.makedirs(settings["ANSIBLE_CACHE_PLUGIN_CONNECTION"], exist_ok=True)
+        else:
+            echo(f"Ansible profile '{self.profile}': ansible.cfg/built-in defaults")
+        env = dict(os.environ, **settings)
+
+        if batch_size:
+            selected = self.list_hosts(limit) if limit else hosts
+            limits = [",".join(selected[i:i + batch_size]) for i in range(0, len(selected), batch_size)]
+        else:
+            limits = [limit]
+
+        for index, batch in enumerate(limits):
+            if len(limits) > 1:
+                echo(f"Batch {index + 1}/{len(limits)}: {batch}")
+            self._run_playbook(extra_vars, tags, with_master(batch), env, playbook)
+
+    def _run_playbook(self, extra_vars, tags, limit, env, playbook="site.yml"):
         try:
-            cmd = ["ansible-playbook", "-i", self.inventory_file, "site.yml"]
+            cmd = ["ansible-playbook", "-i", self.inventory_file, playbook]
             
             # Add provider-specific vars
             provider_vars = f"vars/{self.provider}.yml"
             if os.path.exists(os.path.join(self.ansible_dir, provider_vars)):
                 cmd.extend(["-e", f"@{provider_vars}"])
             
+            # The master's admin kubeconfig lands where KubernetesManager reads
+            # it, per cluster, so concurrent fleet targets never share a file
+            kubeconfig = os.path.abspath(kubeconfig_path(self.provider, self.environment))
+            cmd.extend(["-e", json.dumps({"admin_kubeconfig_dest": kubeconfig})])
+
             # Add extra vars if provided
-            if extra_vars:
+            if isinstance(extra_vars, dict):
+                cmd.extend(["-e", json.dumps(extra_vars)])
+            elif extra_vars:
                 cmd.extend(["-e", f"@{extra_vars}"])
             
             # Add tags if provided
             if tags:
                 cmd.extend(["-t", tags])
 
+            if limit:
+                cmd.extend(["--limit", limit])
+
             # Add verbose output if needed
             if os.getenv("ANSIBLE_VERBOSE"):
                 cmd.append("-v")
 
-            subprocess.run(
-                cmd,
-                cwd=self.ansible_dir,
-                check=True
-            )
+            if trace.current() is None:
+                run(cmd, cwd=self.ansible_dir, env=env, name=f"ansible-playbook {playbook}")
+            else:
+                self._run_traced(cmd, env, playbook)
         except subprocess.CalledProcessError as e:
             raise Exception(f"Ansible playbook execution failed: {e}")
 
+    def _run_traced(self, cmd, env, playbook):
+        """Run the playbook with the kcd_trace callback and merge its task timings into the trace"""
+        with tempfile.NamedTemporaryFile(prefix="kcd-ansible-trace-", suffix=".jsonl", delete=False) as file:
+            records_path = file.name
+        env = dict(env)
+        env["KCD_TRACE_ANSIBLE_FILE"] = records_path
+        plugins = os.path.abspath(os.path.join(self.ansible_dir, "callback_plugins"))
+        env["ANSIBLE_CALLBACK_PLUGINS"] = os.pathsep.join(filter(None, [plugins, env.get("ANSIBLE_CALLBACK_PLUGINS")]))
+        env["ANSIBLE_CALLBACKS_ENABLED"] = ",".join(filter(None, [env.get("ANSIBLE_CALLBACKS_ENABLED"), "kcd_trace"]))
+        try:
+            run(cmd, cwd=self.ansible_dir, env=env, name=f"ansible-playbook {playbook}")
+        finally:
+            with open(records_path, "r") as file:
+                for line in file:
+                    record = json.loads(line)
+                    trace.complete(
+                        record["task"], record["start"], record["end"] - record["start"], "ansible",
+                        lane=f"ansible {record['host']}",
+                        play=record["play"], action=record["action"], status=record["status"]
+                    )
+            os.remove(records_path)
+
     def validate_playbook(self):
         """Validate playbook syntax"""
         try:
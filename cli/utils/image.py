@@ -0,0 +1,137 @@
+import json
+import os
+import subprocess
+import time
+from cli.utils.fileio import write_atomic
+from cli.utils.journal import tree_fingerprint, value_fingerprint
+from cli.utils.output import echo, run
+
+IMAGE_DIR = os.path.join(".kcd", "images")
+# Terraform loads *.auto.tfvars.json on its own, so the image reaches node_ami_id without flags
+TFVARS_FILE = "kcd-image.auto.tfvars.json"
+
+class ImageBuilder:
+    """
+    Bake the node preparation of cluster_init into a reusable image
+
+    The "aws" backend launches a temporary instance from the base AMI, runs
+    ansible/bake.yml against it, snapshots it with create-image and
+    terminates it. The "docker" backend does the same with a container and
+    `docker commit`, as a local stand-in for trying the bake playbook.
+    Builds are keyed by a fingerprint of the role and base image, so an
+    unchanged role reuses the recorded image.
+    """
+
+    def __init__(self, provider, backend="aws", ansible_dir="ansible"):
+        if backend == "aws" and provider != "aws":
+            raise Exception(f"Image builds are only supported for aws, not {provider}")
+        self.provider = provider
+        self.backend = backend
+        self.ansible_dir = ansible_dir
+        self.record_path = os.path.join(IMAGE_DIR, f"{provider}-{backend}.json")
+        self.tfvars_path = os.path.join("terraform", provider, TFVARS_FILE)
+
+    def fingerprint(self, base_image):
+        return value_fingerprint(
+            tree_fingerprint(os.path.join(self.ansible_dir, "roles", "cluster_init"),
+                             os.path.join(self.ansible_dir, "bake.yml")),
+            base_image
+        )
+
+    def recorded(self):
+        """Return the last recorded build, or None"""
+        try:
+            with open(self.record_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def record(self, image_id, fingerprint, base_image):
+        write_atomic(self.record_path, json.dumps({
+            "image_id": image_id,
+            "fingerprint": fingerprint,
+            "base_image": base_image,
+            "created": time.time(),
+        }, indent=2))
+        if self.backend == "aws":
+            write_atomic(self.tfvars_path, json.dumps({"node_ami_id": image_id}, indent=2))
+            echo(f"Nodes will boot from {image_id} (written to {self.tfvars_path})")
+
+    def build(self, base_image, force=False, **options):
+        """Build (or reuse) the image and return its ID"""
+        fingerprint = self.fingerprint(base_image)
+        previous = self.recorded()
+        if not force and previous and previous.get("fingerprint") == fingerprint:
+            echo(f"Image {previous['image_id']} is up to date with the role, reusing it")
+            return previous["image_id"]
+
+        echo(f"Building node image from {base_image} ({self.backend})...")
+        if self.backend == "docker":
+            image_id = self._build_docker(base_image, fingerprint)
+        else:
+            image_id = self._build_aws(base_image, fingerprint, **options)
+        self.record(image_id, fingerprint, base_image)
+        return image_id
+
+    def _bake(self, inventory, fingerprint, extra_args, extra_vars=None):
+        variables = {"kcd_image_fingerprint": fingerprint}
+        variables.update(extra_vars or {})
+        try:
+            run(
+                ["ansible-playbook", "-i", inventory, *extra_args, "-e", json.dumps(variables), "bake.yml"],
+                cwd=self.ansible_dir,
+                env=dict(os.environ, ANSIBLE_HOST_KEY_CHECKING="False")
+            )
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Image bake playbook failed: {e}")
+
+    def _aws(self, *args):
+        try:
+            result = subprocess.run(["aws", "ec2", *args, "--output", "json"], check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"aws ec2 {args[0]} failed: {e.stderr.strip()}")
+        return json.loads(result.stdout) if result.stdout.strip() else {}
+
+    def _build_aws(self, base_image, fingerprint, instance_type="t3.medium", subnet_id=None,
+                   security_group_id=None, key_name=None, ssh_key=None, ssh_user="ubuntu"):
+        if not (subnet_id and security_group_id and key_name and ssh_key):
+            raise Exception("An aws image build needs a public subnet, a security group allowing SSH, "
+                            "a key pair name and its private key")
+        launch = ["run-instances", "--image-id", base_image, "--instance-type", instance_type,
+                  "--subnet-id", subnet_id, "--security-group-ids", security_group_id, "--key-name", key_name,
+                  "--associate-public-ip-address", "--count", "1",
+                  "--tag-specifications", "ResourceType=instance,Tags=[{Key=Name,Value=kcd-image-builder}]"]
+        instance_id = self._aws(*launch)["Instances"][0]["InstanceId"]
+        echo(f"Launched builder instance {instance_id}")
+        try:
+            self._aws("wait", "instance-status-ok", "--instance-ids", instance_id)
+            described = self._aws("describe-instances", "--instance-ids", instance_id)
+            address = described["Reservations"][0]["Instances"][0]["PublicIpAddress"]
+            self._bake(f"{address},", fingerprint,
+                       ["-u", ssh_user, "--private-key", ssh_key])
+
+            name = f"kcd-node-{fingerprint[:12]}-{int(time.time())}"
+            image_id = self._aws("create-image", "--instance-id", instance_id, "--name", name,
+                                 "--description", "Kubernetes node pre-baked by kcdcli")["ImageId"]
+            echo(f"Creating image {image_id} ({name})...")
+            self._aws("wait", "image-available", "--image-ids", image_id)
+            return image_id
+        finally:
+            echo(f"Terminating builder instance {instance_id}")
+            self._aws("terminate-instances", "--instance-ids", instance_id)
+
+    def _build_docker(self, base_image, fingerprint):
+        name = f"kcd-image-builder-{os.getpid()}"
+        subprocess.run(["docker", "run", "-d", "--name", name, base_image, "sleep", "infinity"],
+                       check=True, capture_output=True)
+        try:
+            # The container has no systemd or kernel modules, so the node
+            # setup script itself is left out of the stand-in
+            self._bake(f"{name},", fingerprint, ["-c", "docker"], {"run_node_setup": False})
+            result = subprocess.run(
+                ["docker", "commit", "-m", f"kcd node image {fingerprint[:12]}", name, f"kcd-node:{fingerprint[:12]}"],
+                check=True, capture_output=True, text=True
+            )
+            return result.stdout.strip()
+        finally:
+            subprocess.run(["docker", "rm", "-f", name], capture_output=True)
@@ -0,0 +1,178 @@
+import json
+import os
+import re
+import shlex
+from cli.utils.fileio import write_atomic
+
+# Roles are whole name tokens (k8s-master, k8s-worker-3), never substrings
+_ROLE_TOKEN = re.compile(r'(?:^|[-_.])(master|worker)(?=$|[-_.\d])')
+ROLE_VARS = {
+    "master": {"control_plane": "yes"},
+    "worker": {"control_plane": "no"},
+}
+
+def node_role(name):
+    """Return "master", "worker" or None from a node name"""
+    match = _ROLE_TOKEN.search(name)
+    return match.group(1) if match else None
+
+def _ini_value(value):
+    value = str(value)
+    return shlex.quote(value) if not value or re.search(r"[\s'\"]", value) else value
+
+class Inventory:
+    """
+    Hosts, groups and variables of an Ansible inventory
+
+    Populated straight from cloud discovery, Terraform outputs or an INI
+    file, and rendered to INI, YAML or `ansible-inventory --list` JSON in a
+    single pass over the hosts.
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self.groups = {}
+        self.group_vars = {}
+
+    def add_host(self, host, groups=(), **variables):
+        """Add (or update) a host, its groups and its variables"""
+        self.hosts.setdefault(host, {}).update(variables)
+        for group in groups:
+            members = self.groups.setdefault(group, [])
+            if host not in members:
+                members.append(host)
+        return self
+
+    def remove_host(self, host):
+        self.hosts.pop(host, None)
+        for members in self.groups.values():
+            if host in members:
+                members.remove(host)
+        return self
+
+    def group_hosts(self, group):
+        return list(self.groups.get(group, []))
+
+    @classmethod
+    def from_nodes(cls, nodes, **host_vars):
+        """Build from {node name: ip}, e.g. cloud discovery; roles come from the names"""
+        inventory = cls()
+        inventory.groups = {"master": [], "worker": []}
+        for name, ip in nodes.items():
+            role = node_role(name)
+            if role is None:
+                continue
+            inventory.add_host(ip, [role], **host_vars, node_name=name, **ROLE_VARS[role])
+        return inventory
+
+    @classmethod
+    def from_terraform_outputs(cls, outputs, **host_vars):
+        """Build from `terraform output` values (master_ip/worker_ips or Master_Node_IP/Worker_Node_IPs)"""
+        master_ip = outputs.get("master_ip") or outputs.get("Master_Node_IP")
+        worker_ips = outputs.get("worker_ips") or outputs.get("Worker_Node_IPs") or []
+        nodes = {}
+        if master_ip:
+            nodes["k8s-master"] = master_ip
+        for index, ip in enumerate(worker_ips):
+            nodes[f"k8s-worker-{index + 1}"] = ip
+        return cls.from_nodes(nodes, **host_vars)
+
+    @classmethod
+    def from_ini(cls, text):
+        """Parse an INI inventory: host lines, [group], [group:vars] and [group:children] sections"""
+        inventory = cls()
+        group, section = "ungrouped", "hosts"
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line.startswith(("#", ";")):
+                continue
+            if line.startswith("[") and line.endswith("]"):
+                group, _, section = line[1:-1].partition(":")
+                section = section or "hosts"
+                inventory.groups.setdefault(group, [])
+                continue
+            if section == "vars":
+                key, _, value = line.partition("=")
+                inventory.group_vars.setdefault(group, {})[key.strip()] = value.strip()
+            elif section == "hosts":
+                host, *pairs = shlex.split(line)
+                inventory.add_host(host, [group], **dict(pair.split("=", 1) for pair in pairs if "=" in pair))
+        return inventory
+
+    @classmethod
+    def load(cls, path):
+        """Load an INI or JSON (--list format) inventory file"""
+        with open(path, 'r') as file:
+            text = file.read()
+        if path.endswith(".json"):
+            return cls.from_dict(json.loads(text))
+        return cls.from_ini(text)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from `ansible-inventory --list` style JSON"""
+        inventory = cls()
+        hostvars = data.get("_meta", {}).get("hostvars", {})
+        for group, body in data.items():
+            if group in ("_meta", "all") or not isinstance(body, dict):
+                continue
+            inventory.groups.setdefault(group, [])
+            for host in body.get("hosts", []):
+                inventory.add_host(host, [group], **hostvars.get(host, {}))
+            if body.get("vars"):
+                inventory.group_vars[group] = dict(body["vars"])
+        return inventory
+
+    def to_dict(self):
+        """Return `ansible-inventory --list` style JSON data, with _meta so no --host calls are needed"""
+        data = {"_meta": {"hostvars": self.hosts}}
+        data["all"] = {"children": list(self.groups)}
+        for group, hosts in self.groups.items():
+            data[group] = {"hosts": hosts}
+            if self.group_vars.get(group):
+                data[group]["vars"] = self.group_vars[group]
+        return data
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_ini(self):
+        lines = []
+        for group, hosts in self.groups.items():
+            lines.append(f"[{group}]")
+            for host in hosts:
+                pairs = " ".join(f"{key}={_ini_value(value)}" for key, value in self.hosts[host].items())
+                lines.append(f"{host} {pairs}".rstrip())
+            if self.group_vars.get(group):
+                lines.append(f"[{group}:vars]")
+                lines.extend(f"{key}={_ini_value(value)}" for key, value in self.group_vars[group].items())
+        return "\n".join(lines) + "\n"
+
+    def to_yaml(self):
+        # JSON scalars are valid YAML, so no YAML library is needed
+        lines = ["all:", "  children:"]
+        for group, hosts in self.groups.items():
+            lines.append(f"    {group}:")
+            lines.append("      hosts:" if hosts else "      hosts: {}")
+            for host in hosts:
+                variables = self.hosts[host]
+                lines.append(f"        {json.dumps(host)}:" + ("" if variables else " {}"))
+                lines.extend(f"          {key}: {json.dumps(value)}" for key, value in variables.items())
+            if self.group_vars.get(group):
+                lines.append("      vars:")
+                lines.extend(f"        {key}: {json.dumps(value)}" for key, value in self.group_vars[group].items())
+        return "\n".join(lines) + "\n"
+
+    def render(self, fmt):
+        """Render as ini, yaml or json"""
+        renderers = {"ini": self.to_ini, "yaml": self.to_yaml, "json": self.to_json}
+        if fmt not in renderers:
+            raise Exception(f"Unknown inventory format '{fmt}', expected one of {', '.join(renderers)}")
+        return renderers[fmt]()
+
+    def write(self, path, fmt=None):
+        """Write the inventory atomically; the format follows the extension unless given"""
+        if fmt is None:
+            extension = os.path.splitext(path)[1]
+            fmt = {".yml": "yaml", ".yaml": "yaml", ".json": "json"}.get(extension, "ini")
+        return write_atomic(path, self.render(fmt))
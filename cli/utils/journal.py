@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import time
+from cli.utils.fileio import write_atomic
+
+JOURNAL_DIR = os.path.join(".kcd", "journal")
+# Terraform configuration, without state files or anything init downloads
+TERRAFORM_CONFIG_SUFFIXES = (".tf", ".tf.json", ".tfvars", ".tfvars.json", ".terraform.lock.hcl")
+
+def tree_fingerprint(*paths, exclude=(".terraform", "__pycache__", ".git"), suffixes=None):
+    """Hash the names and contents of files under paths (files or directories)
+
+    With suffixes, only files whose names end in one of them are included.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in exclude)
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if suffixes is None or name.endswith(suffixes)
+                )
+        for file_path in files:
+            digest.update(f"{file_path}\0".encode())
+            with open(file_path, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(block)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+def value_fingerprint(*values):
+    """Hash JSON-serialisable values, e.g. a workspace name and module selection"""
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+class DeployJournal:
+    """
+    Persistent record of the deploy phases that completed, and with what inputs
+
+    One JSON file per provider/environment under .kcd/journal. A phase is
+    skipped on the next run only if it finished, its input fingerprint is
+    unchanged and no earlier phase had to run again.
+    """
+
+    def __init__(self, provider, environment=None):
+        name = f"{provider}-{environment}" if environment else provider
+        self.path = os.path.join(JOURNAL_DIR, f"{name}.json")
+        self.phases = self._load()
+        self._rerun = False
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file).get("phases", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        write_atomic(self.path, json.dumps({"phases": self.phases}, indent=2, sort_keys=True))
+
+    def reset(self):
+        """Forget every recorded phase"""
+        self.phases = {}
+        self._save()
+
+    def should_run(self, phase, fingerprint):
+        """True if the phase must run: unfinished, inputs changed, or an earlier phase ran"""
+        entry = self.phases.get(phase) or {}
+        if self._rerun or entry.get("status") != "done" or entry.get("fingerprint") != fingerprint:
+            self._rerun = True
+            return True
+        return False
+
+    def started(self, phase):
+        self.phases[phase] = {"status": "running", "started": time.time()}
+        self._save()
+
+    def finished(self, phase, fingerprint):
+        entry = self.phases.setdefault(phase, {"started": time.time()})
+        entry.update({"status": "done", "fingerprint": fingerprint, "finished": time.time()})
+        self._save()
+
+    def failed(self, phase, error):
+        entry = self.phases.setdefault(phase, {"started": time.time()})
+        entry.update({"status": "failed", "error": str(error), "finished": time.time()})
+        self._save()
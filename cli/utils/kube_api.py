@@ -0,0 +1,225 @@
+import base64
+import gzip
+import http.client
+import json
+import os
+import queue
+import ssl
+import subprocess
+import tempfile
+from urllib.parse import urlencode, urlsplit
+
+# Ask the API server for a server-side rendered table instead of full objects
+TABLE_ACCEPT = "application/json;as=Table;v=v1;g=meta.k8s.io,application/json"
+
+class KubernetesAPIClient:
+    """Talk to the Kubernetes API server directly over pooled keep-alive connections"""
+
+    def __init__(self, kubeconfig, timeout=None, pool_size=4, page_size=500):
+        self.kubeconfig = kubeconfig
+        self.timeout = timeout
+        self.page_size = page_size
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._headers = {"Accept-Encoding": "gzip"}
+        self._temp_files = []
+        self._load_kubeconfig()
+
+    def _load_kubeconfig(self):
+        """Read the current context of the kubeconfig once"""
+        config = load_kubeconfig(self.kubeconfig)
+        context_name = config.get("current-context")
+        contexts = {c["name"]: c["context"] for c in config.get("contexts", [])}
+        clusters = {c["name"]: c["cluster"] for c in config.get("clusters", [])}
+        users = {u["name"]: u.get("user", {}) for u in config.get("users", [])}
+
+        if context_name not in contexts:
+            raise Exception(f"Kubeconfig {self.kubeconfig} has no usable current-context")
+        context = contexts[context_name]
+        cluster = clusters[context["cluster"]]
+        user = users.get(context.get("user"), {})
+
+        server = urlsplit(cluster["server"])
+        self.scheme = server.scheme
+        self.host = server.hostname
+        self.port = server.port or (443 if server.scheme == "https" else 80)
+        self.base_path = server.path.rstrip("/")
+
+        if "exec" in user or "auth-provider" in user:
+            raise Exception("Kubeconfig exec/auth-provider credentials are not supported by the API backend")
+        if "token" in user:
+            self._headers["Authorization"] = f"Bearer {user['token']}"
+        elif "username" in user:
+            credentials = base64.b64encode(f"{user['username']}:{user.get('password', '')}".encode()).decode()
+            self._headers["Authorization"] = f"Basic {credentials}"
+
+        self.ssl_context = None
+        if self.scheme == "https":
+            context = ssl.create_default_context()
+            if cluster.get("insecure-skip-tls-verify"):
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            elif "certificate-authority-data" in cluster:
+                context.load_verify_locations(cadata=base64.b64decode(cluster["certificate-authority-data"]).decode())
+            elif "certificate-authority" in cluster:
+                context.load_verify_locations(cafile=cluster["certificate-authority"])
+
+            cert_file = user.get("client-certificate") or self._decoded_file(user.get("client-certificate-data"))
+            key_file = user.get("client-key") or self._decoded_file(user.get("client-key-data"))
+            if cert_file:
+                context.load_cert_chain(cert_file, key_file)
+            self.ssl_context = context
+
+    def _decoded_file(self, data):
+        """Write base64 kubeconfig data to a private temp file for the ssl module"""
+        if not data:
+            return None
+        fd, path = tempfile.mkstemp(prefix="kcd-kube-")
+        with os.fdopen(fd, "wb") as file:
+            file.write(base64.b64decode(data))
+        self._temp_files.append(path)
+        return path
+
+    def _connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, path, params=None, accept="application/json"):
+        """GET a path and return the decoded JSON body, reusing a pooled connection"""
+        url = self.base_path + path
+        if params:
+            url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = dict(self._headers, Accept=accept)
+
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        # A kept-alive connection may have been closed by the server; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                connection.request("GET", url, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                connection.close()
+                if attempt:
+                    raise Exception(f"Kubernetes API request failed: {e}")
+                connection = self._connect()
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise Exception(f"Kubernetes API request failed: {e}")
+
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if response.status >= 400:
+            raise Exception(f"Kubernetes API request {path} failed: {response.status} {body[:200].decode(errors='replace')}")
+        return json.loads(body)
+
+    def list(self, path, label_selector=None, field_selector=None, accept="application/json", extra_params=None):
+        """Yield list pages following the continue token, so large lists stay bounded in memory"""
+        params = {
+            "labelSelector": label_selector,
+            "fieldSelector": field_selector,
+            "limit": self.page_size,
+        }
+        params.update(extra_params or {})
+        while True:
+            page = self.request(path, params, accept=accept)
+            yield page
+            token = page.get("metadata", {}).get("continue")
+            if not token:
+                return
+            params["continue"] = token
+
+    def table(self, path, columns, label_selector=None, field_selector=None):
+        """Yield dicts of the requested columns from a server-side table listing"""
+        # includeObject=None drops the embedded object metadata from every row
+        pages = self.list(path, label_selector, field_selector, accept=TABLE_ACCEPT,
+                          extra_params={"includeObject": "None"})
+        for page in pages:
+            definitions = [c["name"] for c in page.get("columnDefinitions", [])]
+            indexes = {column: definitions.index(column) for column in columns if column in definitions}
+            for row in page.get("rows", []):
+                cells = row["cells"]
+                yield {column: cells[index] for column, index in indexes.items()}
+
+    def watch(self, path, resource_version, label_selector=None, field_selector=None, timeout_seconds=300):
+        """Yield watch events for path starting after resource_version
+
+        The stream uses its own connection, since it stays open until the
+        server ends the watch after timeout_seconds.
+        """
+        params = {
+            "watch": "1",
+            "resourceVersion": resource_version,
+            "allowWatchBookmarks": "true",
+            "timeoutSeconds": timeout_seconds,
+            "labelSelector": label_selector,
+            "fieldSelector": field_selector,
+        }
+        url = self.base_path + path + "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = {k: v for k, v in self._headers.items() if k != "Accept-Encoding"}
+        headers["Accept"] = "application/json"
+
+        if self.scheme == "https":
+            connection = http.client.HTTPSConnection(self.host, self.port, timeout=timeout_seconds + 30,
+                                                     context=self.ssl_context)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout_seconds + 30)
+        try:
+            connection.request("GET", url, headers=headers)
+            response = connection.getresponse()
+            if response.status >= 400:
+                raise Exception(f"Kubernetes API watch {path} failed: {response.status} {response.read(200).decode(errors='replace')}")
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException) as e:
+            raise Exception(f"Kubernetes API watch failed: {e}")
+        finally:
+            connection.close()
+
+    def version(self):
+        return self.request("/version")
+
+    def close(self):
+        """Close pooled connections and remove decoded credential files"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        for path in self._temp_files:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._temp_files = []
+
+
+def load_kubeconfig(path):
+    """Parse a kubeconfig file, which may be JSON or YAML"""
+    with open(path, "r") as file:
+        content = file.read()
+    if content.lstrip().startswith("{"):
+        return json.loads(content)
+    try:
+        import yaml
+        return yaml.safe_load(content)
+    except ImportError:
+        # Without PyYAML let kubectl do the conversion, once
+        result = subprocess.run(
+            ["kubectl", "config", "view", "--raw", "-o", "json", "--kubeconfig", path],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return json.loads(result.stdout)
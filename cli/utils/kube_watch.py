@@ -0,0 +1,101 @@
+import queue
+import threading
+from cli.utils.kubernetes import node_status, pod_status
+
+# kind -> (list/watch path, status function)
+WATCHED_RESOURCES = {
+    "node": ("/api/v1/nodes", node_status),
+    "pod": ("/api/v1/namespaces/kube-system/pods", pod_status),
+}
+
+class ClusterWatcher:
+    """Keep an in-memory index of node and pod status up to date from watch streams"""
+
+    def __init__(self, api, resources=None):
+        self.api = api
+        self.resources = resources or WATCHED_RESOURCES
+        self.index = {kind: {} for kind in self.resources}
+        self.resource_versions = {}
+        self.changes = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def list(self, kind):
+        """Replace the index for kind with a full list and remember its resourceVersion"""
+        path, status_of = self.resources[kind]
+        entries = {}
+        resource_version = None
+        for page in self.api.list(path):
+            resource_version = page["metadata"].get("resourceVersion", resource_version)
+            for item in page.get("items", []):
+                entries[item["metadata"]["name"]] = status_of(item)
+
+        with self._lock:
+            previous = self.index[kind]
+            self.index[kind] = entries
+            self.resource_versions[kind] = resource_version
+
+        # After a relist, report whatever drifted while the watch was down
+        if previous:
+            for name in previous.keys() | entries.keys():
+                if previous.get(name) != entries.get(name):
+                    self.changes.put((kind, name, previous.get(name), entries.get(name)))
+        return entries
+
+    def apply(self, kind, event):
+        """Apply one watch event to the index, returning the change or None"""
+        obj = event["object"]
+        resource_version = obj.get("metadata", {}).get("resourceVersion")
+        if event["type"] == "BOOKMARK":
+            self.resource_versions[kind] = resource_version
+            return None
+
+        name = obj["metadata"]["name"]
+        _, status_of = self.resources[kind]
+        with self._lock:
+            old = self.index[kind].get(name)
+            if event["type"] == "DELETED":
+                new = None
+                self.index[kind].pop(name, None)
+            else:
+                new = status_of(obj)
+                self.index[kind][name] = new
+            self.resource_versions[kind] = resource_version
+
+        if old == new:
+            return None
+        return (kind, name, old, new)
+
+    def _follow(self, kind):
+        path, _ = self.resources[kind]
+        while not self._stop.is_set():
+            try:
+                for event in self.api.watch(path, self.resource_versions[kind]):
+                    if self._stop.is_set():
+                        return
+                    if event["type"] == "ERROR":
+                        # 410 Gone: our resourceVersion is too old, start over from a fresh list
+                        self.list(kind)
+                        break
+                    change = self.apply(kind, event)
+                    if change:
+                        self.changes.put(change)
+            except Exception as e:
+                # Report the failure and relist after a short pause
+                self.changes.put((kind, None, None, str(e)))
+                self._stop.wait(5)
+                if not self._stop.is_set():
+                    try:
+                        self.list(kind)
+                    except Exception:
+                        pass
+
+    def start(self):
+        """List every resource once, then follow each watch stream in a thread"""
+        for kind in self.resources:
+            self.list(kind)
+        for kind in self.resources:
+            threading.Thread(target=self._follow, args=(kind,), name=f"kcd-watch-{kind}", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,60 +1,141 @@
 import subprocess
 import json
 import os
+import threading
+from cli.utils import trace
+from cli.utils.process import engine
+
+def node_status(node):
+    """Return Ready/NotReady from a node object's Ready condition"""
+    for condition in node['status'].get('conditions', []):
+        if condition['type'] == 'Ready':
+            return "Ready" if condition['status'] == 'True' else "NotReady"
+    return "Ready"
+
+def pod_status(pod):
+    """Return the phase of a pod object"""
+    return pod['status'].get('phase', 'Unknown')
+
+def kubeconfig_path(provider, environment=None):
+    """Kubeconfig of a cluster, relative to the working tree"""
+    if environment:
+        return f"config/kubeconfig/{provider}-{environment}-config"
+    return f"config/kubeconfig/{provider}-config"
 
 class KubernetesManager:
-    def __init__(self, provider):
+    def __init__(self, provider, timeout=None, backend=None, environment=None):
         self.provider = provider
-        self.kubeconfig = f"config/kubeconfig/{provider}-config"
+        self.kubeconfig = kubeconfig_path(provider, environment)
+        self.timeout = timeout
+        # "kubectl" shells out per query, "api" talks to the API server directly
+        self.backend = backend or os.getenv("KCD_K8S_BACKEND", "kubectl")
+        self._api = None
+        self._api_lock = threading.Lock()
+
+    @property
+    def api(self):
+        """Lazily created API client, shared by every query of this manager"""
+        with self._api_lock:
+            if self._api is None:
+                from cli.utils.kube_api import KubernetesAPIClient
+                self._api = KubernetesAPIClient(self.kubeconfig, timeout=self.timeout)
+            return self._api
+
+    def close(self):
+        """Release the API client connections, if any"""
+        if self._api is not None:
+            self._api.close()
+            self._api = None
 
     def is_available(self):
         """Check if the cluster is accessible"""
         try:
-            self._run_command(["kubectl", "cluster-info"])
+            if self.backend == "api":
+                self.api.version()
+            else:
+                self._run_command(["kubectl", "cluster-info"])
             return True
         except:
             return False
 
-    def get_nodes(self):
+    def get_nodes(self, label_selector=None):
         """Get status of all nodes"""
-        output = self._run_command(["kubectl", "get", "nodes", "-o", "json"])
+        if self.backend == "api":
+            return [
+                {'name': row['Name'], 'status': row['Status'].split(',')[0]}
+                for row in self.api.table("/api/v1/nodes", ["Name", "Status"], label_selector=label_selector)
+            ]
+
+        command = ["kubectl", "get", "nodes", "-o", "json"]
+        if label_selector:
+            command.extend(["-l", label_selector])
+        output = self._run_command(command)
         nodes_json = json.loads(output)
         
         nodes = []
         for node in nodes_json['items']:
-            status = "Ready"
-            for condition in node['status']['conditions']:
-                if condition['type'] == 'Ready':
-                    status = "Ready" if condition['status'] == 'True' else "NotReady"
-                    break
-            
             nodes.append({
                 'name': node['metadata']['name'],
-                'status': status
+                'status': node_status(node)
             })
         return nodes
 
-    def get_pods(self):
+    def get_pods(self, label_selector=None, field_selector=None):
         """Get status of system pods"""
-        output = self._run_command([
+        if self.backend == "api":
+            # The table's Status column is a display reason (CrashLoopBackOff, ...),
+            # not the phase kubectl and the watcher report, so list the objects
+            return [
+                {'name': pod['metadata']['name'], 'status': pod_status(pod)}
+                for page in self.api.list("/api/v1/namespaces/kube-system/pods",
+                                          label_selector=label_selector, field_selector=field_selector)
+                for pod in page.get('items', [])
+            ]
+
+        command = [
             "kubectl", "get", "pods",
             "-n", "kube-system",
             "-o", "json"
-        ])
+        ]
+        if label_selector:
+            command.extend(["-l", label_selector])
+        if field_selector:
+            command.extend(["--field-selector", field_selector])
+        output = self._run_command(command)
         pods_json = json.loads(output)
         
         pods = []
         for pod in pods_json['items']:
             pods.append({
                 'name': pod['metadata']['name'],
-                'status': pod['status']['phase']
+                'status': pod_status(pod)
             })
         return pods
 
+    def cordon(self, node):
+        """Mark a node unschedulable"""
+        self._run_command(["kubectl", "cordon", node])
+
+    def drain(self, node, timeout=300):
+        """Evict a node's pods (DaemonSets stay), waiting up to timeout seconds"""
+        self._run_command([
+            "kubectl", "drain", node,
+            "--ignore-daemonsets",
+            "--delete-emptydir-data",
+            f"--timeout={timeout}s"
+        ])
+
+    def delete_node(self, node):
+        """Remove a node object, e.g. once its instance is gone"""
+        self._run_command(["kubectl", "delete", "node", node, "--ignore-not-found"])
+
     def get_component_status(self):
         """Get status of cluster components"""
-        output = self._run_command(["kubectl", "get", "componentstatuses", "-o", "json"])
-        cs_json = json.loads(output)
+        if self.backend == "api":
+            cs_json = self.api.request("/api/v1/componentstatuses")
+        else:
+            output = self._run_command(["kubectl", "get", "componentstatuses", "-o", "json"])
+            cs_json = json.loads(output)
         
         components = []
         for cs in cs_json['items']:
@@ -75,14 +156,20 @@ class KubernetesManager:
         env = os.environ.copy()
         env["KUBECONFIG"] = self.kubeconfig
         
-        try:
-            result = subprocess.run(
-                command,
-                env=env,
-                check=True,
-                capture_output=True,
-                text=True
-            )
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Kubernetes command failed: {e}") 
\ No newline at end of file
+        with trace.span(" ".join(command[:3]), "subprocess", command=" ".join(command)) as info:
+            try:
+                result = engine.run(
+                    command,
+                    env=env,
+                    capture=True,
+                    echo_output=False,
+                    timeout=self.timeout
+                )
+                info["exit_code"] = result.returncode
+                info["output_bytes"] = result.output_bytes
+                return result.stdout
+            except subprocess.CalledProcessError as e:
+                info["exit_code"] = e.returncode
+                raise Exception(f"Kubernetes command failed: {e}: {e.output.strip()}")
+            except subprocess.TimeoutExpired as e:
+                raise Exception(f"Kubernetes command timed out: {e}") 
\ No newline at end of file
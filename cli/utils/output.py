@@ -0,0 +1,63 @@
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+import click
+from cli.utils import trace
+
+_local = threading.local()
+_lock = threading.Lock()
+
+@contextmanager
+def prefixed(prefix):
+    """Prefix every line echoed or run from this thread, e.g. with a fleet target name"""
+    previous = getattr(_local, "prefix", None)
+    _local.prefix = prefix
+    try:
+        yield
+    finally:
+        _local.prefix = previous
+
+def current_prefix():
+    return getattr(_local, "prefix", None)
+
+def echo(message="", err=False):
+    """click.echo that honours the thread's prefix and never interleaves mid-line"""
+    prefix = current_prefix()
+    if prefix is None:
+        click.echo(message, err=err)
+        return
+    with _lock:
+        for line in str(message).splitlines() or [""]:
+            click.echo(f"{click.style(f'[{prefix}]', fg='cyan')} {line}", err=err)
+
+def run(command, cwd=None, env=None, on_line=None, name=None, timeout=None):
+    """
+    Run a command, streaming its output, and raise CalledProcessError on failure
+
+    Without a prefix or on_line the child inherits the terminal, so prompts
+    (terraform variables, ansible become/vault passwords) reach the user.
+    Otherwise output is echoed line by line as it arrives (with the thread's
+    prefix, if any) through the shared command engine, which keeps only a
+    bounded tail in memory, and stdin is closed. on_line may rewrite each
+    line (returning None hides it). Every call is recorded as a trace span
+    with its exit code and, when piped, its output size.
+    """
+    from cli.utils.process import engine
+
+    if name is None:
+        name = os.path.basename(command[0])
+        if len(command) > 1 and not command[1].startswith("-"):
+            name = f"{name} {command[1]}"
+
+    with trace.span(name, "subprocess", command=" ".join(command)) as info:
+        if current_prefix() is None and on_line is None:
+            result = subprocess.run(command, cwd=cwd, env=env, timeout=timeout)
+            info["exit_code"] = result.returncode
+            result.check_returncode()
+            return result
+        result = engine.run(command, check=False, cwd=cwd, env=env, timeout=timeout, on_line=on_line)
+        info["exit_code"] = result.returncode
+        info["output_bytes"] = result.output_bytes
+        result.check_returncode()
+        return result
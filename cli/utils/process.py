@@ -0,0 +1,192 @@
+import asyncio
+import collections
+import subprocess
+import tempfile
+import threading
+import time
+from cli.utils.output import current_prefix, echo, prefixed
+
+# Lines longer than this are cut when echoed or kept in the tail; captured
+# output is stored unchanged
+MAX_LINE = 64 * 1024
+# Captured output is held in memory up to this size, then spills to disk
+SPOOL_SIZE = 8 << 20
+
+class CommandResult:
+    """Outcome of one command: exit code, last lines of output and, if captured, the full output"""
+
+    def __init__(self, command, returncode, tail, duration, output_bytes, stdout_file=None, stderr_file=None):
+        self.command = command
+        self.returncode = returncode
+        self.tail = tail
+        self.duration = duration
+        self.output_bytes = output_bytes
+        self.stdout_file = stdout_file
+        self.stderr_file = stderr_file
+
+    @staticmethod
+    def _read(file):
+        if file is None:
+            return None
+        file.seek(0)
+        return file.read().decode(errors="replace")
+
+    @property
+    def stdout(self):
+        return self._read(self.stdout_file)
+
+    @property
+    def stderr(self):
+        return self._read(self.stderr_file)
+
+    def check_returncode(self):
+        if self.returncode:
+            raise subprocess.CalledProcessError(self.returncode, self.command, output="\n".join(self.tail))
+
+class CommandEngine:
+    """
+    Run subprocesses on one shared asyncio loop
+
+    Commands can be started from any thread, and any number can run at once.
+    stdout and stderr are read in chunks and split into lines as they
+    arrive. Each line can be echoed (with the caller's output prefix) and
+    is kept in a per-command tail and in the engine's ring-buffered log,
+    so memory stays bounded however much a command prints. Full output is
+    kept only when asked for, in spooled temporary files. Timeouts and
+    cancellation kill the child.
+    """
+
+    def __init__(self, tail_lines=200, log_lines=5000):
+        self.tail_lines = tail_lines
+        self.log = collections.deque(maxlen=log_lines)
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="kcd-process-engine", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, command, cwd=None, env=None, stdin=None, timeout=None, capture=False, echo_output=True,
+               on_line=None):
+        """Start a command and return a concurrent.futures.Future of its CommandResult
+
+        stdin may be bytes or a binary file object. Cancelling the future
+        kills the command.
+        """
+        coroutine = self._run(list(command), cwd, env, stdin, timeout, capture, echo_output, on_line, current_prefix())
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def run(self, command, check=True, **kwargs):
+        """Run a command to completion; see submit for the arguments
+
+        Raises CalledProcessError (with the output tail) on failure when
+        check is set, and TimeoutExpired when the timeout passes.
+        """
+        future = self.submit(command, **kwargs)
+        try:
+            result = future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+        if check:
+            result.check_returncode()
+        return result
+
+    def recent(self, lines=50):
+        """Return the last lines of output across every command, oldest first"""
+        return list(self.log)[-lines:]
+
+    async def _run(self, command, cwd, env, stdin, timeout, capture, echo_output, on_line, prefix):
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            env=env,
+            stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        tail = collections.deque(maxlen=self.tail_lines)
+        files = [tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) for _ in range(2)] if capture else [None, None]
+        counts = [0, 0]
+        label = command[0]
+
+        def handle(line, is_stderr):
+            if len(line) > MAX_LINE:
+                line = line[:MAX_LINE] + "…"
+            tail.append(line)
+            self.log.append((time.time(), label, line))
+            if not echo_output:
+                return
+            with prefixed(prefix):
+                if on_line is not None:
+                    line = on_line(line)
+                if line is not None:
+                    echo(line, err=is_stderr and prefix is None)
+
+        async def pump(stream, index):
+            pending = b""
+            while True:
+                chunk = await stream.read(1 << 16)
+                if not chunk:
+                    break
+                counts[index] += len(chunk)
+                if files[index] is not None:
+                    files[index].write(chunk)
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    handle(line.rstrip(b"\r").decode(errors="replace"), index == 1)
+                if len(pending) > MAX_LINE:
+                    handle(pending.decode(errors="replace"), index == 1)
+                    pending = b""
+            if pending:
+                handle(pending.rstrip(b"\r").decode(errors="replace"), index == 1)
+
+        async def feed():
+            try:
+                if isinstance(stdin, (bytes, bytearray)):
+                    process.stdin.write(stdin)
+                    await process.stdin.drain()
+                else:
+                    for block in iter(lambda: stdin.read(1 << 16), b""):
+                        process.stdin.write(block)
+                        await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # The command stopped reading; its exit code tells the story
+                pass
+            finally:
+                process.stdin.close()
+
+        tasks = [pump(process.stdout, 0), pump(process.stderr, 1)]
+        if stdin is not None:
+            tasks.append(feed())
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks, process.wait()), timeout)
+        except asyncio.TimeoutError:
+            await self._kill(process)
+            raise subprocess.TimeoutExpired(command, timeout, output="\n".join(tail))
+        except asyncio.CancelledError:
+            await self._kill(process)
+            raise
+
+        return CommandResult(command, process.returncode, list(tail), time.monotonic() - start, sum(counts), *files)
+
+    async def _kill(self, process, grace=5):
+        """Terminate the child, and kill it if it is still running after grace seconds"""
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), grace)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass
+
+engine = CommandEngine()
@@ -1,62 +1,323 @@
 import os
 import subprocess
-import click
 import json
+import tempfile
+import threading
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from cli.utils import trace
+from cli.utils.output import current_prefix, echo, prefixed, run
+from cli.utils.tfgraph import init_fingerprint, module_graph, with_dependencies, with_dependents, layers
+from cli.utils.tfstate import LocalStateIndex, iter_show_resources
+
+_BACKEND_BLOCK = re.compile(r'backend\s+"(\w+)"\s*\{([^}]*)\}')
+_PATH_SETTING = re.compile(r'path\s*=\s*"([^"]+)"')
 
 class TerraformManager:
-    def __init__(self, provider):
+    # init and workspace selection write to the shared .terraform directory,
+    # so runs against the same root take turns for those steps
+    _dir_locks = {}
+    _dir_locks_guard = threading.Lock()
+
+    def __init__(self, provider, workspace=None, parallelism=None):
         self.provider = provider
         self.tf_dir = f"terraform/{provider}"
+        self.workspace = workspace
+        self.parallelism = parallelism
+
+    @property
+    def plan_file(self):
+        """Default saved plan path, relative to tf_dir, one per workspace"""
+        return os.path.join(".terraform", "plans", f"{self.workspace or 'default'}.tfplan")
 
-    def init(self):
-        """Initialize Terraform"""
-        click.echo("Initializing Terraform...")
-        self._run_command(["terraform", "init"])
+    @property
+    def init_stamp(self):
+        return os.path.join(self.tf_dir, ".terraform", "kcd-init.sha256")
+
+    def needs_init(self):
+        """True unless the last successful init saw the same lock file, backend and module sources"""
+        if not os.path.isdir(os.path.join(self.tf_dir, ".terraform", "providers")):
+            return True
+        try:
+            with open(self.init_stamp, 'r') as file:
+                return file.read().strip() != init_fingerprint(self.tf_dir)
+        except OSError:
+            return True
 
-    def plan(self):
-        """Create Terraform plan"""
-        click.echo("Creating Terraform plan...")
-        self._run_command(["terraform", "plan"])
+    def _dir_lock(self):
+        with self._dir_locks_guard:
+            return self._dir_locks.setdefault(os.path.abspath(self.tf_dir), threading.Lock())
 
-    def apply(self):
-        """Apply Terraform configuration"""
-        click.echo("Applying Terraform configuration...")
-        self._run_command(["terraform", "apply", "-auto-approve"])
+    def init(self, force=False):
+        """Initialize Terraform, skipping it when nothing init depends on has changed"""
+        with self._dir_lock():
+            if not force and not self.needs_init():
+                echo("Terraform already initialized (lock file, backend and modules unchanged), skipping init")
+                return
+            echo("Initializing Terraform...")
+            self._run_command(["terraform", "init", "-input=false"], select_workspace=False)
+            # init may rewrite the lock file, so fingerprint afterwards
+            with open(self.init_stamp, 'w') as file:
+                file.write(init_fingerprint(self.tf_dir))
+
+    def ensure_workspace(self):
+        """Create the manager's workspace on first use, leaving the root's selected workspace as it was
+
+        Every command selects its workspace through TF_WORKSPACE, so the
+        shared .terraform/environment selection is never relied on.
+        """
+        if self.workspace in (None, "default"):
+            return
+        with self._dir_lock():
+            names, selected = self.workspaces()
+            if self.workspace in names:
+                return
+            # workspace new also selects the new workspace; switch back so
+            # other runs of this root are not moved to it
+            self._run_command(["terraform", "workspace", "new", self.workspace], select_workspace=False)
+            self._run_command(["terraform", "workspace", "select", selected], select_workspace=False)
+
+    def workspaces(self):
+        """Return the root's workspace names and the one .terraform/environment selects"""
+        from cli.utils.process import engine
+        try:
+            result = engine.run(["terraform", "workspace", "list"], cwd=self.tf_dir,
+                                env=self._env(select_workspace=False), capture=True, echo_output=False)
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Terraform command failed: {e}: {e.output.strip()}")
+        names, selected = [], "default"
+        for line in result.stdout.splitlines():
+            name = line.strip()
+            if name.startswith("* "):
+                name = selected = name[2:]
+            if name:
+                names.append(name)
+        return names, selected
+
+    def targets(self, modules, include_dependents=False):
+        """Resolve selected modules to -target flags, following the main.tf module graph
+
+        Terraform pulls in what a target depends on by itself, so only the
+        selection (plus its dependents, if asked) becomes -target flags.
+        """
+        graph = module_graph(self.tf_dir)
+        involved = with_dependencies(graph, modules)
+        selected = set(modules)
+        if include_dependents:
+            selected = with_dependents(graph, selected)
+            involved = with_dependencies(graph, selected)
+        for depth, layer in enumerate(layers(graph, involved)):
+            echo(f"  layer {depth}: {', '.join(f'module.{m}' for m in layer)}")
+        return [f"-target=module.{module}" for module in sorted(selected)]
+
+    def plan(self, modules=None, plan_file=None, include_dependents=False):
+        """Create Terraform plan and save it so apply runs exactly this plan"""
+        echo("Creating Terraform plan...")
+        plan_file = plan_file or self.plan_file
+        os.makedirs(os.path.join(self.tf_dir, os.path.dirname(plan_file)), exist_ok=True)
+        command = ["terraform", "plan", f"-out={plan_file}"]
+        if modules:
+            command.extend(self.targets(modules, include_dependents))
+        command.extend(self._parallelism_args())
+        self._run_command(command, machine_readable=True)
+        return plan_file
+
+    def apply(self, plan_file=None, modules=None):
+        """Apply Terraform configuration
+
+        With plan_file, the saved plan is applied as-is and terraform does
+        not re-plan. Otherwise the configuration is planned and applied in
+        one step, optionally limited to modules.
+        """
+        echo("Applying Terraform configuration...")
+        if plan_file:
+            self._run_command(["terraform", "apply", *self._parallelism_args(), plan_file], machine_readable=True)
+            return
+        command = ["terraform", "apply", "-auto-approve"]
+        if modules:
+            command.extend(self.targets(modules))
+        command.extend(self._parallelism_args())
+        self._run_command(command, machine_readable=True)
 
     def destroy(self):
         """Destroy infrastructure"""
-        click.echo("Destroying infrastructure...")
-        self._run_command(["terraform", "destroy", "-auto-approve"])
+        echo("Destroying infrastructure...")
+        self._run_command(["terraform", "destroy", "-auto-approve"], machine_readable=True)
+
+    def output(self):
+        """Return the root module outputs as {name: value}"""
+        from cli.utils.process import engine
+        try:
+            result = engine.run(["terraform", "output", "-json"], cwd=self.tf_dir, env=self._env(),
+                                capture=True, echo_output=False)
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Terraform command failed: {e}: {e.output.strip()}")
+        return {name: value.get("value") for name, value in json.loads(result.stdout or "{}").items()}
 
-    def get_status(self):
+    def get_status(self, timeout=None):
         """Get status of infrastructure resources"""
+        state_path = self.local_state_path()
+        if state_path and os.path.isfile(state_path):
+            # Fast path: read the local state directly instead of starting terraform
+            cache_path = os.path.join(self.tf_dir, ".terraform", "kcd-state-index.json")
+            try:
+                return LocalStateIndex(state_path, cache_path).load()
+            except (OSError, ValueError):
+                pass
+        return {address: state for address, _, state in self.iter_status(timeout)}
+
+    def local_state_path(self):
+        """Return the state file path if the backend is local, otherwise None"""
+        # Non-default workspaces keep their state elsewhere; let terraform resolve those
+        if self.workspace not in (None, "default"):
+            return None
+
+        # After init, terraform records the effective backend here
         try:
-            output = subprocess.run(
+            with open(os.path.join(self.tf_dir, ".terraform", "terraform.tfstate"), 'r') as file:
+                backend = json.load(file).get("backend") or {}
+            if backend.get("type") != "local":
+                return None
+            path = (backend.get("config") or {}).get("path") or "terraform.tfstate"
+            return os.path.join(self.tf_dir, path)
+        except (OSError, ValueError):
+            pass
+
+        path = "terraform.tfstate"
+        for name in sorted(os.listdir(self.tf_dir)) if os.path.isdir(self.tf_dir) else []:
+            if not name.endswith(".tf"):
+                continue
+            with open(os.path.join(self.tf_dir, name), 'r') as file:
+                for backend_type, body in _BACKEND_BLOCK.findall(file.read()):
+                    if backend_type != "local":
+                        return None
+                    setting = _PATH_SETTING.search(body)
+                    if setting:
+                        path = setting.group(1)
+        return os.path.join(self.tf_dir, path)
+
+    def iter_status(self, timeout=None):
+        """Yield (address, type, status) for every resource, including those in child modules"""
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
                 ["terraform", "show", "-json"],
                 cwd=self.tf_dir,
-                check=True,
-                capture_output=True,
-                text=True
+                env=self._env(),
+                stdout=subprocess.PIPE,
+                stderr=stderr
             )
-            tf_state = json.loads(output.stdout)
-            
-            status = {}
-            for resource in tf_state.get('values', {}).get('root_module', {}).get('resources', []):
-                name = resource['address']
-                state = resource.get('values', {}).get('status', 'unknown')
-                status[name] = state
-            
-            return status
-        except subprocess.CalledProcessError as e:
-            raise Exception(f"Failed to get infrastructure status: {e}")
+            # Kill the process if it runs past the timeout; the reader then sees EOF
+            timed_out = threading.Event()
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), process.kill())) if timeout else None
+            if timer:
+                timer.start()
+            try:
+                yield from iter_show_resources(process.stdout)
+            except ValueError as e:
+                if not timed_out.is_set():
+                    raise Exception(f"Failed to parse infrastructure status: {e}")
+            finally:
+                if timer:
+                    timer.cancel()
+                process.stdout.close()
+                process.wait()
+
+            if timed_out.is_set():
+                raise Exception(f"Timed out getting infrastructure status after {timeout}s")
+            if process.returncode != 0:
+                stderr.seek(0)
+                raise Exception(f"Failed to get infrastructure status: {stderr.read().decode(errors='replace').strip()}")
+
+    def _parallelism_args(self):
+        return [f"-parallelism={self.parallelism}"] if self.parallelism else []
+
+    def _env(self, select_workspace=True):
+        env = os.environ.copy()
+        # Share downloaded providers across every working directory and run
+        if "TF_PLUGIN_CACHE_DIR" not in env:
+            env["TF_PLUGIN_CACHE_DIR"] = plugin_cache_dir()
+        if select_workspace:
+            # Always explicit: without it terraform uses whatever workspace the
+            # root had selected last, possibly another cluster's
+            env["TF_WORKSPACE"] = self.workspace or "default"
+        else:
+            # TF_WORKSPACE overrides selection, so it must not be set here
+            env.pop("TF_WORKSPACE", None)
+        return env
 
-    def _run_command(self, command):
-        """Run Terraform command"""
+    def _json_line(self, line):
+        """Turn one line of -json output back into its message, recording per-resource timings"""
         try:
-            subprocess.run(
+            message = json.loads(line)
+        except ValueError:
+            return line
+        if message.get("type") in ("apply_complete", "apply_errored"):
+            hook = message.get("hook") or {}
+            elapsed = hook.get("elapsed_seconds", 0)
+            try:
+                end = datetime.fromisoformat(message["@timestamp"].replace("Z", "+00:00")).timestamp()
+            except (KeyError, ValueError):
+                end = time.time()
+            address = (hook.get("resource") or {}).get("addr", "unknown")
+            trace.complete(
+                address, end - elapsed, elapsed, "terraform",
+                lane=f"terraform {address}",
+                action=hook.get("action"),
+                result="ok" if message["type"] == "apply_complete" else "error"
+            )
+        return message.get("@message")
+
+    def _run_command(self, command, select_workspace=True, machine_readable=False):
+        """Run Terraform command
+
+        While tracing, machine_readable commands run with -json so each
+        resource's create/update/destroy time ends up in the trace.
+        """
+        on_line = None
+        if machine_readable and current_prefix() is not None:
+            # Piped runs have no terminal to prompt on; fail on missing variables instead of waiting
+            command = command[:2] + ["-input=false"] + command[2:]
+        if machine_readable and trace.current() is not None:
+            command = command[:2] + ["-json"] + command[2:]
+            on_line = self._json_line
+        try:
+            run(
                 command,
                 cwd=self.tf_dir,
-                check=True
+                env=self._env(select_workspace),
+                on_line=on_line
             )
         except subprocess.CalledProcessError as e:
-            raise Exception(f"Terraform command failed: {e}") 
\ No newline at end of file
+            raise Exception(f"Terraform command failed: {e}") 
+
+def plugin_cache_dir():
+    """Return the shared provider plugin cache directory, creating it if needed"""
+    path = os.path.join(os.path.expanduser("~"), ".terraform.d", "plugin-cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def run_parallel(managers, action, max_workers=None, **kwargs):
+    """
+    Run the same TerraformManager method on several roots/workspaces at once
+
+    Each manager must own its state (a different tf_dir or workspace), since
+    terraform locks the state for the whole run. Output is prefixed with the
+    workspace (or directory) it belongs to. Returns {manager: error} for the
+    runs that failed.
+    """
+    def run_one(manager):
+        with prefixed(manager.workspace or manager.tf_dir):
+            manager.ensure_workspace()
+            getattr(manager, action)(**kwargs)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(managers) or 1) as executor:
+        futures = {executor.submit(run_one, manager): manager for manager in managers}
+        for future, manager in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors[manager] = e
+    return errors
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+
+_MODULE_START = re.compile(r'\bmodule\s+"([^"]+)"\s*\{')
+_MODULE_REF = re.compile(r'\bmodule\.([A-Za-z0-9_-]+)')
+_INIT_BLOCK_START = re.compile(r'\b(backend\s+"[^"]+"|required_providers|provider\s+"[^"]+")\s*\{')
+_MODULE_SOURCE = re.compile(r'^\s*(source|version)\s*=\s*"([^"]*)"', re.M)
+
+def _strip_comments(text):
+    """Drop #, // and /* */ comments while leaving string contents alone"""
+    out = []
+    i = 0
+    in_string = False
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if c == '\\':
+                out.append(text[i + 1:i + 2])
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif c == '#' or text.startswith('//', i):
+            end = text.find('\n', i)
+            i = len(text) if end == -1 else end
+            continue
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = len(text) if end == -1 else end + 2
+            continue
+        else:
+            out.append(c)
+        i += 1
+    return ''.join(out)
+
+def _block_end(text, start):
+    """Return the index just past the brace that closes the block opened before start"""
+    depth = 1
+    i = start
+    in_string = False
+    while i < len(text) and depth:
+        c = text[i]
+        if in_string:
+            if c == '\\':
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        i += 1
+    return i
+
+def _tf_files(tf_dir):
+    for name in sorted(os.listdir(tf_dir)):
+        if name.endswith(".tf"):
+            with open(os.path.join(tf_dir, name), 'r') as file:
+                yield name, _strip_comments(file.read())
+
+def init_fingerprint(tf_dir):
+    """
+    Hash everything that decides whether `terraform init` has work to do
+
+    That is the dependency lock file, backend/provider requirement blocks and
+    each module's source/version, following local modules recursively.
+    Resource and variable edits do not change it, so routine config changes
+    do not force a re-init.
+    """
+    digest = hashlib.sha256()
+    lock_file = os.path.join(tf_dir, ".terraform.lock.hcl")
+    if os.path.isfile(lock_file):
+        with open(lock_file, 'rb') as file:
+            digest.update(file.read())
+
+    pending = [tf_dir]
+    seen = set()
+    while pending:
+        directory = os.path.normpath(pending.pop())
+        if directory in seen or not os.path.isdir(directory):
+            continue
+        seen.add(directory)
+        label = os.path.relpath(directory, tf_dir)
+        for name, text in _tf_files(directory):
+            for match in _INIT_BLOCK_START.finditer(text):
+                body = text[match.end():_block_end(text, match.end())]
+                digest.update(f"{label}/{name}:{match.group(1)}:{' '.join(body.split())}\n".encode())
+            for match in _MODULE_START.finditer(text):
+                body = text[match.end():_block_end(text, match.end())]
+                attributes = sorted(_MODULE_SOURCE.findall(body))
+                digest.update(f"{label}/{name}:module {match.group(1)}:{attributes}\n".encode())
+                for key, value in attributes:
+                    if key == "source" and value.startswith(("./", "../")):
+                        pending.append(os.path.join(directory, value))
+    return digest.hexdigest()
+
+def module_graph(tf_dir):
+    """
+    Build {module: set(modules it references)} from the module blocks of a root
+
+    Only module-to-module references (module.<name>.<output>) are edges, which
+    is what decides whether two modules can be planned independently.
+    """
+    graph = {}
+    for _, text in _tf_files(tf_dir):
+        for match in _MODULE_START.finditer(text):
+            body = text[match.end():_block_end(text, match.end())]
+            graph[match.group(1)] = set(_MODULE_REF.findall(body)) - {match.group(1)}
+    return graph
+
+def with_dependencies(graph, modules):
+    """Return modules plus everything they transitively reference"""
+    unknown = set(modules) - graph.keys()
+    if unknown:
+        raise Exception(f"Unknown module(s): {', '.join(sorted(unknown))}. Available: {', '.join(sorted(graph))}")
+    selected = set()
+    stack = list(modules)
+    while stack:
+        module = stack.pop()
+        if module not in selected:
+            selected.add(module)
+            stack.extend(graph.get(module, ()))
+    return selected
+
+def with_dependents(graph, modules):
+    """Return modules plus everything that transitively references them"""
+    selected = set(modules)
+    changed = True
+    while changed:
+        changed = False
+        for module, deps in graph.items():
+            if module not in selected and deps & selected:
+                selected.add(module)
+                changed = True
+    return selected
+
+def layers(graph, modules=None):
+    """Group modules into dependency layers; modules in one layer are independent"""
+    remaining = set(graph if modules is None else modules)
+    result = []
+    while remaining:
+        layer = {m for m in remaining if not (graph.get(m, set()) & remaining)}
+        if not layer:
+            raise Exception(f"Module dependency cycle between: {', '.join(sorted(remaining))}")
+        result.append(sorted(layer))
+        remaining -= layer
+    return result
@@ -0,0 +1,201 @@
+import codecs
+import json
+import mmap
+import os
+import re
+from cli.utils.fileio import write_atomic
+
+# One JSON token, with leading whitespace skipped. Strings are matched whole so
+# braces inside them never confuse the depth tracking.
+_TOKEN = re.compile(r'\s*(?:([{}\[\],:])|("(?:[^"\\]|\\.)*")|([^{}\[\],:"\s]+))')
+_WHITESPACE = re.compile(r'\s*')
+_SERIAL = re.compile(rb'"serial"\s*:\s*(\d+)')
+_LINEAGE = re.compile(rb'"lineage"\s*:\s*"([^"]*)"')
+# serial and lineage sit at the top of every state file
+_HEADER_SIZE = 4096
+
+def _resource_status(values):
+    """Pick the field that best describes a resource's state"""
+    return values.get('status') or values.get('instance_state') or 'unknown'
+
+def _is_resource_path(path):
+    """True for values.root_module(.child_modules[])*.resources[]"""
+    if path[:2] != ['values', 'root_module'] or path[-2:] != ['resources', '[]']:
+        return False
+    middle = path[2:-2]
+    return len(middle) % 2 == 0 and all(
+        middle[i] == 'child_modules' and middle[i + 1] == '[]' for i in range(0, len(middle), 2)
+    )
+
+def _is_state_resource_path(path):
+    """True for resources[] at the top of a state file"""
+    return path == ['resources', '[]']
+
+def iter_show_resources(stream, chunk_size=1 << 16):
+    """
+    Yield (address, type, status) for every resource in `terraform show -json`
+
+    Reads the binary stream incrementally and walks root_module and every
+    nested child_modules entry. Only the resource currently being parsed is
+    held in memory, never the whole document.
+    """
+    for resource in _iter_objects(stream, _is_resource_path, chunk_size):
+        yield (
+            resource.get('address'),
+            resource.get('type'),
+            _resource_status(resource.get('values') or {}),
+        )
+
+def iter_state_resources(stream, chunk_size=1 << 16):
+    """Yield (address, type, status) for every resource instance in a raw state file"""
+    for resource in _iter_objects(stream, _is_state_resource_path, chunk_size):
+        prefix = f"{resource['module']}." if resource.get('module') else ''
+        if resource.get('mode') == 'data':
+            prefix += 'data.'
+        base = f"{prefix}{resource['type']}.{resource['name']}"
+        for instance in resource.get('instances', []):
+            key = instance.get('index_key')
+            if key is None:
+                address = base
+            elif isinstance(key, int):
+                address = f"{base}[{key}]"
+            else:
+                address = f"{base}[{json.dumps(key)}]"
+            yield (address, resource['type'], _resource_status(instance.get('attributes') or {}))
+
+def _iter_objects(stream, is_target, chunk_size):
+    """Yield each JSON object whose key path satisfies is_target, parsed one at a time"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+    # containers holds the open '{'/'[' tokens; path[i] is the key (or '[]')
+    # through which containers[i + 1] was entered
+    containers = []
+    path = []
+    pending_key = None
+    expect_key = False
+    capture_start = None
+    capture_depth = None
+
+    while True:
+        m = _TOKEN.match(buf, pos)
+        # A token touching the end of the buffer may be cut short; read more first
+        if m is None or (m.end() == len(buf) and not eof):
+            if eof:
+                # A document cut short (a state file being written, a killed
+                # terraform show) must not pass for a complete one
+                if containers or capture_start is not None:
+                    raise ValueError("Truncated Terraform JSON")
+                if _WHITESPACE.match(buf, pos).end() != len(buf):
+                    raise ValueError("Malformed Terraform JSON")
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            # Keep the resource being captured; drop everything else already consumed
+            keep = capture_start if capture_start is not None else pos
+            buf = buf[keep:] + decoder.decode(chunk, final=eof)
+            pos -= keep
+            if capture_start is not None:
+                capture_start = 0
+            continue
+
+        punct, string, _ = m.groups()
+        pos = m.end()
+
+        if capture_start is not None:
+            # Inside a resource: only track nesting until it closes
+            if punct in ('{', '['):
+                containers.append(punct)
+            elif punct in ('}', ']'):
+                containers.pop()
+                if len(containers) == capture_depth:
+                    obj = json.loads(buf[capture_start:pos])
+                    capture_start = None
+                    path.pop()
+                    yield obj
+            continue
+
+        if punct in ('{', '['):
+            if containers:
+                path.append(pending_key if containers[-1] == '{' else '[]')
+            if punct == '{' and is_target(path):
+                capture_start = pos - 1
+                capture_depth = len(containers)
+            containers.append(punct)
+            expect_key = punct == '{'
+        elif punct in ('}', ']'):
+            containers.pop()
+            if containers:
+                path.pop()
+        elif punct == ',':
+            expect_key = containers[-1] == '{'
+        elif punct == ':':
+            expect_key = False
+        elif string is not None and expect_key:
+            pending_key = json.loads(string)
+
+
+def _state_header(header):
+    """Return (serial, lineage) from the first bytes of a state file"""
+    serial = _SERIAL.search(header)
+    lineage = _LINEAGE.search(header)
+    return (int(serial.group(1)) if serial else None), (lineage.group(1).decode() if lineage else None)
+
+def state_version(state_path):
+    """Return (serial, lineage) of a local state file, or (None, None) if there is none"""
+    try:
+        with open(state_path, 'rb') as file:
+            return _state_header(file.read(_HEADER_SIZE))
+    except (OSError, TypeError):
+        return None, None
+
+class LocalStateIndex:
+    """Index resource status straight from a local state file
+
+    The index is cached next to the working directory and keyed by the state
+    file's mtime/size and by its serial/lineage, so it is only rebuilt when
+    Terraform has actually written a new state.
+    """
+
+    def __init__(self, state_path, cache_path):
+        self.state_path = state_path
+        self.cache_path = cache_path
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, cache):
+        write_atomic(self.cache_path, json.dumps(cache))
+
+    def load(self):
+        """Return {address: status}, rebuilding the index only if the state changed"""
+        stat = os.stat(self.state_path)
+        cache = self._read_cache()
+        if cache and cache.get('mtime_ns') == stat.st_mtime_ns and cache.get('size') == stat.st_size:
+            return cache['status']
+        if stat.st_size == 0:
+            return {}
+
+        with open(self.state_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            serial, lineage = _state_header(mapped[:_HEADER_SIZE])
+
+            # Touched but not rewritten (e.g. a no-op refresh): keep the index
+            if cache and serial is not None and cache.get('serial') == serial and cache.get('lineage') == lineage:
+                status = cache['status']
+            else:
+                status = {address: state for address, _, state in iter_state_resources(mapped)}
+
+        self._write_cache({
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'serial': serial,
+            'lineage': lineage,
+            'status': status,
+        })
+        return status
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Tracer:
+    """
+    Collect timed spans and write them as a Chrome trace
+
+    Every span becomes a complete ("X") event in microseconds since the
+    epoch, so events from subprocesses (Terraform's -json stream, the
+    Ansible callback) can be merged in with their own timestamps. The
+    file opens in chrome://tracing or Perfetto and in `profile`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self._tids = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, label):
+        """Map a lane label (thread, fleet target, host) to a numeric tid"""
+        tid = self._tids.get(label)
+        if tid is None:
+            tid = self._tids[label] = len(self._tids) + 1
+            self.events.append({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": label}})
+        return tid
+
+    def complete(self, name, start, duration, category="phase", lane=None, **args):
+        """Record a finished span that started at start (epoch seconds) and lasted duration seconds"""
+        if lane is None:
+            from cli.utils.output import current_prefix
+            lane = current_prefix() or threading.current_thread().name
+        with self._lock:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": max(0, int(duration * 1e6)),
+                "pid": self.pid,
+                "tid": self._tid(lane),
+                "args": args,
+            })
+
+    @contextmanager
+    def span(self, name, category="phase", **args):
+        """Time the body as a span; the yielded dict becomes the span's args"""
+        info = dict(args)
+        start = time.time()
+        try:
+            yield info
+        except BaseException as e:
+            info.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            self.complete(name, start, time.time() - start, category, **info)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            events = list(self.events)
+        with open(self.path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+_tracer = None
+
+def start(path):
+    """Start collecting spans for this process; they are written to path by finish()"""
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+def current():
+    """The active Tracer, or None when tracing is off"""
+    return _tracer
+
+def finish():
+    """Write the trace file, if tracing, and stop collecting; return its path, or None if nothing was written
+
+    A run that recorded no spans leaves an existing file alone rather than
+    replacing it with an empty trace.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    if os.path.exists(tracer.path) and not any(event["ph"] == "X" for event in tracer.events):
+        return None
+    tracer.save()
+    return tracer.path
+
+@contextmanager
+def span(name, category="phase", **args):
+    """Tracer.span on the active tracer; a no-op (still yielding a dict) when tracing is off"""
+    if _tracer is None:
+        yield dict(args)
+        return
+    with _tracer.span(name, category, **args) as info:
+        yield info
+
+def complete(name, start, duration, category="phase", lane=None, **args):
+    if _tracer is not None:
+        _tracer.complete(name, start, duration, category, lane, **args)
+
+def load(path):
+    """Return the complete events of a trace file, sorted by start time"""
+    with open(path, 'r') as file:
+        data = json.load(file)
+    events = data["traceEvents"] if isinstance(data, dict) else data
+    return sorted((e for e in events if e.get("ph") == "X"), key=lambda e: (e["ts"], -e["dur"]))
+
+def _can_nest(parent, child):
+    """A span nests in its own lane, or under the subprocess whose output produced it"""
+    if child["ts"] + child["dur"] > parent["ts"] + parent["dur"]:
+        return False
+    return parent["tid"] == child["tid"] or (parent["cat"] == "subprocess" and child["cat"] in ("terraform", "ansible"))
+
+def build_tree(events):
+    """Nest events by time containment; returns the top-level nodes as {event, children}"""
+    roots = []
+    open_nodes = []
+    for event in events:
+        node = {"event": event, "children": []}
+        open_nodes = [n for n in open_nodes if n["event"]["ts"] + n["event"]["dur"] > event["ts"]]
+        parent = next((n for n in reversed(open_nodes) if _can_nest(n["event"], event)), None)
+        (parent["children"] if parent else roots).append(node)
+        open_nodes.append(node)
+    return roots
+
+def critical_path(nodes):
+    """
+    Return the chain of nodes that decides the end time of this level
+
+    Starting from the node that finishes last, repeatedly step back to the
+    latest-finishing node that ended before the current one started. Work
+    running alongside the chain could be sped up without shortening the run.
+    """
+    chain = []
+    remaining = sorted(nodes, key=lambda n: n["event"]["ts"] + n["event"]["dur"])
+    limit = None
+    while remaining:
+        candidates = [n for n in remaining if limit is None or n["event"]["ts"] + n["event"]["dur"] <= limit]
+        if not candidates:
+            break
+        node = candidates[-1]
+        chain.append(node)
+        limit = node["event"]["ts"]
+        remaining = [n for n in candidates if n is not node]
+    return list(reversed(chain))
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+import importlib
+import click
+
+class LazyGroup(click.Group):
+    """
+    Click group whose subcommands are imported the first time they are used
+
+    Subcommands are given as {name: "module:attribute"}, so starting the CLI
+    only imports click, and each command then imports just the managers it
+    uses.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx, name):
+        if name in self.lazy_subcommands and name not in self.commands:
+            module, attribute = self.lazy_subcommands[name].split(":")
+            self.add_command(getattr(importlib.import_module(module), attribute), name)
+        return super().get_command(ctx, name)
+
+@click.group(cls=LazyGroup, lazy_subcommands={
+    'bootstrap': 'main:bootstrap',
+    'cluster': 'main:cluster',
+    'fleet': 'main:fleet',
+    'profile': 'main:profile',
+})
+@click.option('--trace', 'trace_file', envvar='KCD_TRACE', metavar='FILE',
+              help='Write a Chrome trace of every phase and subprocess to FILE (default: $KCD_TRACE)')
+@click.pass_context
+def cli(ctx, trace_file):
+    """Kubernetes Cluster Deployment CLI"""
+    ctx.ensure_object(dict)
+    # profile reads traces; tracing it would rewrite the file it analyses
+    if trace_file and ctx.invoked_subcommand != 'profile':
+        from cli.utils import trace
+        trace.start(trace_file)
+        ctx.call_on_close(lambda: _report_trace(trace.finish()))
+
+def _report_trace(path):
+    if path:
+        click.echo(f"Trace written to {path}", err=True)
+
+if __name__ == '__main__':
+    cli(obj={})
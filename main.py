@@ -1,14 +1,17 @@
 #!/usr/bin/python3
 import click
 import os
-from cli.utils.terraform import TerraformManager
 
-@click.group()
-def cli():
-    """Kubernetes Cluster Deployment CLI"""
-    pass
+@click.command(name='profile')
+@click.argument('trace_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--top', type=int, default=10, show_default=True, help='How many spans to list by self time')
+@click.option('--depth', type=int, default=4, show_default=True, help='How deep to follow the critical path')
+def profile(trace_file, top, depth):
+    """Summarise a trace written with --trace: critical path and hot spans"""
+    from cli.commands.profile import profile_trace
+    profile_trace(trace_file, top=top, depth=depth)
 
-@cli.group()
+@click.group()
 @click.option('--provider', '-p', type=click.Choice(['aws', 'azure', 'gcp']), required=True, help='Cloud provider')
 @click.pass_context
 def cluster(ctx, provider):
@@ -18,38 +21,278 @@ def cluster(ctx, provider):
 
 @cluster.command(name='init')
 @click.pass_context
-def terraform_init(ctx):
+@click.option('--force', is_flag=True, help='Run terraform init even if nothing relevant changed')
+def terraform_init(ctx, force):
     """Initialize Terraform"""
+    from cli.utils.terraform import TerraformManager
     provider = ctx.obj['provider']
     tf = TerraformManager(provider)
-    tf.init()
+    tf.init(force=force)
+
+def _run_workspaces(provider, workspaces, parallelism, action, **kwargs):
+    """Run a TerraformManager action on several workspaces of the provider root at once"""
+    from cli.utils.terraform import TerraformManager, run_parallel
+    managers = [TerraformManager(provider, workspace=workspace, parallelism=parallelism) for workspace in workspaces]
+    managers[0].init()
+    errors = run_parallel(managers, action, **kwargs)
+    for manager, error in errors.items():
+        click.echo(click.style(f"Error: [{manager.workspace}] {str(error)}", fg="red"))
+    if errors:
+        raise click.Abort()
+    return managers
 
 @cluster.command(name='plan')
 @click.pass_context
-def terraform_plan(ctx):
-    """Show Terraform plan"""
+@click.option('--module', '-m', 'modules', multiple=True, help='Only plan this module (and what it depends on); repeatable')
+@click.option('--with-dependents', is_flag=True, help='Also plan modules that depend on the selected ones')
+@click.option('--out', 'plan_file', help='Where to save the plan, relative to the provider directory')
+@click.option('--parallelism', type=int, help='Terraform -parallelism')
+@click.option('--workspace', 'workspaces', multiple=True, help='Plan this workspace; repeat to plan several in parallel')
+def terraform_plan(ctx, modules, with_dependents, plan_file, parallelism, workspaces):
+    """Show Terraform plan and save it for apply"""
+    from cli.utils.terraform import TerraformManager
     provider = ctx.obj['provider']
-    tf = TerraformManager(provider)
-    tf.plan()
+    if len(workspaces) > 1:
+        if plan_file:
+            raise click.BadParameter("cannot be combined with several --workspace; each saves its own plan", param_hint="'--out'")
+        managers = _run_workspaces(provider, workspaces, parallelism, "plan", modules=list(modules),
+                                   include_dependents=with_dependents)
+        for tf in managers:
+            click.echo(f"[{tf.workspace}] Plan saved; apply it with: apply --workspace {tf.workspace} --plan-file {tf.plan_file}")
+        return
+    tf = TerraformManager(provider, workspace=workspaces[0] if workspaces else None, parallelism=parallelism)
+    tf.ensure_workspace()
+    saved = tf.plan(modules=list(modules), plan_file=plan_file, include_dependents=with_dependents)
+    click.echo(f"Plan saved to {os.path.join(tf.tf_dir, saved)}; apply it with: apply --plan-file {saved}")
 
 @cluster.command(name='apply')
 @click.pass_context
-def terraform_apply(ctx):
+@click.option('--plan-file', help='Apply this saved plan instead of planning again')
+@click.option('--module', '-m', 'modules', multiple=True, help='Only apply this module (and what it depends on); repeatable')
+@click.option('--parallelism', type=int, help='Terraform -parallelism')
+@click.option('--workspace', 'workspaces', multiple=True, help='Apply to this workspace; repeat to apply to several in parallel')
+def terraform_apply(ctx, plan_file, modules, parallelism, workspaces):
     """Apply Terraform configuration"""
+    from cli.utils.terraform import TerraformManager
     provider = ctx.obj['provider']
-    tf = TerraformManager(provider)
-    tf.apply()
+    if len(workspaces) > 1:
+        if plan_file:
+            raise click.BadParameter("cannot be combined with several --workspace", param_hint="'--plan-file'")
+        _run_workspaces(provider, workspaces, parallelism, "apply", modules=list(modules))
+        return
+    tf = TerraformManager(provider, workspace=workspaces[0] if workspaces else None, parallelism=parallelism)
+    tf.ensure_workspace()
+    tf.apply(plan_file=plan_file, modules=list(modules))
+
+@cluster.command(name='configure')
+@click.pass_context
+@click.option('--profile', type=click.Choice(['default', 'fast', 'scale']), help='Ansible performance profile (default: $KCD_ANSIBLE_PROFILE or default)')
+@click.option('--limit', '-l', help='Only run against these hosts or groups')
+@click.option('--batch-size', type=int, help='Roll through the hosts in --limit batches of this size')
+@click.option('--tags', '-t', help='Only run tasks with these tags')
+def ansible_configure(ctx, profile, limit, batch_size, tags):
+    """Run the Ansible playbook against the cluster nodes"""
+    from cli.utils.ansible import AnsibleManager
+    provider = ctx.obj['provider']
+    ansible = AnsibleManager(provider, profile=profile)
+    ansible.run_playbook(tags=tags, limit=limit, batch_size=batch_size)
+
+@cluster.command(name='join')
+@click.pass_context
+@click.option('--wave-size', type=int, default=5, show_default=True, help='Workers in the first wave')
+@click.option('--max-wave-size', type=int, default=50, show_default=True, help='Waves double after a clean wave up to this size')
+@click.option('--retries', type=int, default=2, show_default=True, help='Join attempts per node beyond the first')
+@click.option('--ready-timeout', type=int, default=600, show_default=True, help='Seconds a wave may take to become Ready')
+@click.option('--host', 'hosts', multiple=True, help='Only join these inventory hosts; repeatable')
+@click.option('--prepare', is_flag=True, help='Also run node preparation on the joining workers')
+@click.option('--profile', type=click.Choice(['default', 'fast', 'scale']), help='Ansible performance profile')
+def cluster_join(ctx, wave_size, max_wave_size, retries, ready_timeout, hosts, prepare, profile):
+    """Join worker nodes in waves, waiting for each wave to become Ready"""
+    from cli.commands.join import join_workers
+    provider = ctx.obj['provider']
+    join_workers(provider, wave_size=wave_size, max_wave_size=max_wave_size, retries=retries,
+                 ready_timeout=ready_timeout, hosts=list(hosts) or None, prepare=prepare, ansible_profile=profile)
+
+@cluster.command(name='scale')
+@click.pass_context
+@click.option('--workers', type=click.IntRange(min=0), required=True, help='Number of worker nodes wanted')
+@click.option('--wave-size', type=int, default=5, show_default=True, help='New workers joined in the first wave')
+@click.option('--drain-timeout', type=int, default=300, show_default=True, help='Seconds to drain each removed worker')
+@click.option('--profile', type=click.Choice(['default', 'fast', 'scale']), help='Ansible performance profile')
+@click.option('--auto-approve', is_flag=True, help='Remove workers without asking')
+def cluster_scale(ctx, workers, wave_size, drain_timeout, profile, auto_approve):
+    """Add or remove worker nodes, configuring only the ones that change"""
+    from cli.commands.scale import scale_workers
+    scale_workers(ctx.obj['provider'], workers, wave_size=wave_size, drain_timeout=drain_timeout,
+                  ansible_profile=profile, auto_approve=auto_approve)
+
+@cluster.group(name='image')
+def cluster_image():
+    """Build and inspect pre-baked node images"""
+    pass
+
+@cluster_image.command(name='build')
+@click.pass_context
+@click.option('--base-image', required=True, help='AMI (or, with --local, container image) to bake from')
+@click.option('--local', is_flag=True, help='Bake into a local container instead of an AMI, to try the playbook')
+@click.option('--instance-type', default='t3.medium', show_default=True, help='Builder instance type')
+@click.option('--subnet-id', help='Public subnet for the builder instance')
+@click.option('--security-group-id', help='Security group allowing SSH to the builder from here')
+@click.option('--key-name', help='EC2 key pair for the builder instance')
+@click.option('--ssh-key', type=click.Path(exists=True, dir_okay=False), help='Private key of --key-name')
+@click.option('--ssh-user', default='ubuntu', show_default=True, help='SSH user of the base image')
+@click.option('--force', is_flag=True, help='Rebuild even if the role has not changed since the last build')
+def image_build(ctx, base_image, local, instance_type, subnet_id, security_group_id, key_name, ssh_key, ssh_user, force):
+    """Bake node preparation into an image that the nodes then boot from"""
+    from cli.utils.image import ImageBuilder
+    provider = ctx.obj['provider']
+    try:
+        builder = ImageBuilder(provider, backend='docker' if local else 'aws')
+        options = {} if local else dict(instance_type=instance_type, subnet_id=subnet_id,
+                                        security_group_id=security_group_id, key_name=key_name,
+                                        ssh_key=ssh_key, ssh_user=ssh_user)
+        image_id = builder.build(base_image, force=force, **options)
+        click.echo(click.style(f"✓ Node image {image_id} ready", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        raise click.Abort()
+
+@cluster_image.command(name='show')
+@click.pass_context
+@click.option('--local', is_flag=True, help='Show the local container image instead of the AMI')
+def image_show(ctx, local):
+    """Show the recorded node image"""
+    from cli.utils.image import ImageBuilder
+    builder = ImageBuilder(ctx.obj['provider'], backend='docker' if local else 'aws')
+    record = builder.recorded()
+    if not record:
+        click.echo("No node image has been built yet")
+        return
+    click.echo(f"{record['image_id']} from {record['base_image']}, fingerprint {record['fingerprint'][:12]}, "
+               f"up to date: {'yes' if record['fingerprint'] == builder.fingerprint(record['base_image']) else 'no'}")
+
+@cluster.command(name='deploy')
+@click.pass_context
+@click.option('--skip-terraform', is_flag=True, help='Only run the Ansible configuration')
+@click.option('--skip-ansible', is_flag=True, help='Only run Terraform')
+@click.option('--module', '-m', 'modules', multiple=True, help='Only deploy this module (and what it depends on); repeatable')
+@click.option('--parallelism', type=int, help='Terraform -parallelism')
+@click.option('--profile', type=click.Choice(['default', 'fast', 'scale']), help='Ansible performance profile')
+@click.option('--join-wave-size', type=int, help='Join workers afterwards in Ready-gated waves starting at this size')
+@click.option('--fresh', is_flag=True, help='Ignore the deploy journal and run every phase')
+def cluster_deploy(ctx, skip_terraform, skip_ansible, modules, parallelism, profile, join_wave_size, fresh):
+    """Provision the infrastructure and configure the cluster, resuming where the last run stopped"""
+    from cli.commands.deploy import deploy_cluster
+    deploy_cluster(ctx.obj['provider'], skip_terraform=skip_terraform, skip_ansible=skip_ansible,
+                   modules=list(modules), parallelism=parallelism, ansible_profile=profile,
+                   join_wave_size=join_wave_size, fresh=fresh)
+
+@cluster.command(name='update')
+@click.pass_context
+def cluster_update(ctx):
+    """Plan, confirm and apply infrastructure changes, then re-run the configuration"""
+    from cli.commands.update import update_cluster
+    update_cluster(ctx.obj['provider'])
+
+@cluster.command(name='status')
+@click.pass_context
+@click.option('--watch', '-w', is_flag=True, help='Follow node and pod changes instead of printing once')
+@click.option('--max-age', type=int, envvar='KCD_STATUS_MAX_AGE', default=30, show_default=True,
+              help='Oldest health agent snapshot to accept, in seconds')
+@click.option('--direct', is_flag=True, help='Probe the cluster even if a health agent is running')
+def cluster_status(ctx, watch, max_age, direct):
+    """Show cluster status"""
+    from cli.commands.status import get_cluster_status, watch_cluster_status
+    provider = ctx.obj['provider']
+
+    if watch:
+        watch_cluster_status(provider)
+    else:
+        get_cluster_status(provider, max_age=max_age, use_agent=not direct)
+
+@cluster.command(name='agent')
+@click.pass_context
+@click.option('--interval', type=int, default=15, show_default=True, help='Seconds between probe rounds')
+@click.option('--watch', is_flag=True, help='Follow nodes and pods through API watches instead of listing them')
+@click.option('--environment', '-e', help='Serve this environment (Terraform workspace), as fleet commands address it with provider:environment')
+def cluster_agent(ctx, interval, watch, environment):
+    """Serve a cached status snapshot to status calls until interrupted"""
+    import signal
+    from cli.commands.status import PROBE_TIMEOUT
+    from cli.utils.agent import HealthAgent
+    agent = HealthAgent(ctx.obj['provider'], environment=environment, interval=interval, timeout=PROBE_TIMEOUT,
+                        watch=watch)
+    click.echo(f"Serving status snapshots on {agent.path} (refreshed every {interval}s, Ctrl-C to stop)")
+    # Process supervisors stop the agent with SIGTERM; shut down as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        agent.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        click.echo(click.style(f"Error: {str(e)}", fg="red"))
+        raise click.Abort()
 
 @cluster.command(name='destroy')
 @click.pass_context
 @click.option('--auto-approve', is_flag=True, help='Skip interactive approval')
-def terraform_destroy(ctx, auto_approve):
+def cluster_destroy(ctx, auto_approve):
     """Destroy Terraform infrastructure"""
+    from cli.commands.destroy import destroy_cluster
     provider = ctx.obj['provider']
-    tf = TerraformManager(provider)
-    
+
     if auto_approve or click.confirm(f'Are you sure you want to destroy the {provider} infrastructure?'):
-        tf.destroy()
+        destroy_cluster(provider)
+
+@click.group()
+@click.option('--target', '-t', 'targets', multiple=True, required=True,
+              help='Cluster as provider[:environment], e.g. aws:dev; repeatable')
+@click.option('--workers', type=int, default=4, show_default=True, help='Clusters processed at once')
+@click.pass_context
+def fleet(ctx, targets, workers):
+    """Run an operation across many clusters in parallel"""
+    ctx.ensure_object(dict)
+    ctx.obj['targets'] = targets
+    ctx.obj['workers'] = workers
+
+@fleet.command(name='deploy')
+@click.pass_context
+@click.option('--skip-terraform', is_flag=True, help='Only run the Ansible configuration')
+@click.option('--skip-ansible', is_flag=True, help='Only run Terraform')
+@click.option('--fresh', is_flag=True, help='Ignore the deploy journal and run every phase')
+def fleet_deploy(ctx, skip_terraform, skip_ansible, fresh):
+    """Deploy every target cluster, resuming each where its last run stopped"""
+    from cli.commands.fleet import run_fleet
+    failed = run_fleet('deploy', ctx.obj['targets'], ctx.obj['workers'],
+                       skip_terraform=skip_terraform, skip_ansible=skip_ansible, fresh=fresh)
+    ctx.exit(1 if failed else 0)
+
+@fleet.command(name='status')
+@click.pass_context
+def fleet_status(ctx):
+    """Show the status of every target cluster"""
+    from cli.commands.fleet import run_fleet
+    failed = run_fleet('status', ctx.obj['targets'], ctx.obj['workers'])
+    ctx.exit(1 if failed else 0)
+
+@fleet.command(name='destroy')
+@click.pass_context
+@click.option('--auto-approve', is_flag=True, help='Skip interactive approval')
+def fleet_destroy(ctx, auto_approve):
+    """Destroy every target cluster"""
+    from cli.commands.fleet import run_fleet
+    targets = ctx.obj['targets']
+    if auto_approve or click.confirm(f"Are you sure you want to destroy {', '.join(targets)}?"):
+        failed = run_fleet('destroy', targets, ctx.obj['workers'])
+        ctx.exit(1 if failed else 0)
+
+@click.command(name='bootstrap', add_help_option=False, context_settings={'ignore_unknown_options': True})
+@click.argument('args', nargs=-1, type=click.UNPROCESSED)
+def bootstrap(args):
+    """Configure the cluster from its bastion host (run_commands.py; see bootstrap --help)"""
+    from run_commands import main as run_bootstrap
+    run_bootstrap(list(args))
 
 if __name__ == '__main__':
-    cli(obj={}) 
\ No newline at end of file
+    from kcdcli import cli
+    cli(obj={})
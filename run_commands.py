@@ -4,11 +4,25 @@ import json
 import os
 import logging
 import os
+import fnmatch
+import hashlib
+import io
+import re
+import shlex
+import shutil
 import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from dotenv import load_dotenv
 
-load_dotenv()
+from cli.utils import trace
+from cli.utils.fileio import write_atomic
+from cli.utils.inventory import Inventory
+from cli.utils.process import engine
 
 
 class ConfigLoader:
@@ -18,43 +32,224 @@ class ConfigLoader:
         with open(config_file, 'r') as file:
             return json.load(file)
 
+class InstanceCache:
+    """Class to cache cloud instance lookups on disk for a limited time."""
+    def __init__(self, ttl=None, cache_dir=None):
+        self.ttl = int(os.getenv("KCD_INSTANCE_CACHE_TTL", "300")) if ttl is None else ttl
+        base = os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+        self.cache_dir = cache_dir or os.path.join(base, "kcdcli", "instances")
+
+    def _path(self, provider, filter, instance_type):
+        key = hashlib.sha256(f"{provider}\0{filter}\0{instance_type}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, provider, filter, instance_type):
+        """Return the cached lookup, or None if it is missing or older than the TTL."""
+        if self.ttl <= 0:
+            return None
+        try:
+            with open(self._path(provider, filter, instance_type), 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('timestamp', 0) > self.ttl:
+            return None
+        return entry.get('value')
+
+    def set(self, provider, filter, instance_type, value):
+        """Store a lookup result, replacing the file atomically."""
+        if self.ttl <= 0:
+            return
+        write_atomic(self._path(provider, filter, instance_type),
+                     json.dumps({'timestamp': time.time(), 'value': value}))
+
 class CloudInstanceManager:
     """Class to manage cloud instances based on the cloud provider."""
-    def __init__(self, cloud_provider):
+
+    def __init__(self, cloud_provider, cache=None):
         self.cloud_provider = cloud_provider
+        self.cache = cache or InstanceCache()
 
     def fetch_instance_details(self, filter, instance_type):
         """Fetch instance details using the appropriate cloud provider CLI."""
+        return self.fetch_instances([(filter, instance_type)])[(filter, instance_type)]
+
+    def fetch_instances(self, lookups):
+        """Fetch several (filter, instance_type) lookups with one describe call.
+
+        Cached results are served without calling the cloud CLI. Each value has
+        the same "name<TAB>value" line format as fetch_instance_details.
+        """
+        results = {}
+        missing = []
+        for lookup in lookups:
+            cached = self.cache.get(self.cloud_provider, *lookup)
+            if cached is not None:
+                results[lookup] = cached
+            elif lookup not in missing:
+                missing.append(lookup)
+
+        if missing:
+            filters = list(dict.fromkeys(filter for filter, _ in missing))
+            attributes = list(dict.fromkeys(instance_type for _, instance_type in missing))
+            rows = self._describe(filters, attributes)
+            for filter, instance_type in missing:
+                column = attributes.index(instance_type)
+                lines = [
+                    f"{name}\t{values[column]}"
+                    for key, name, values in rows
+                    if self._matches(filter, key)
+                ]
+                value = "\n".join(lines)
+                # An empty answer usually means the instances are still booting
+                if value:
+                    self.cache.set(self.cloud_provider, filter, instance_type, value)
+                results[(filter, instance_type)] = value
+        return results
+
+    def _describe(self, filters, attributes):
+        """Run one describe call covering every filter and return (key, name, values) rows."""
+        fields = ", ".join(attributes)
         if self.cloud_provider == 'aws':
             command = [
                 'aws', 'ec2', 'describe-instances',
-                '--filters', f"Name=tag:Name,Values={filter}", "Name=instance-state-name,Values=running",
-                '--query', f"Reservations[].Instances[].[Tags[?Key=='Name'].Value | [0], {instance_type}]",
+                '--filters', f"Name=tag:Name,Values={','.join(filters)}", "Name=instance-state-name,Values=running",
+                '--query', f"Reservations[].Instances[].[Tags[?Key=='Name'].Value | [0], {fields}]",
                 '--output', 'text'
             ]
         elif self.cloud_provider == 'azure':
+            names = " || ".join(f"tags.Name=='{filter}'" for filter in filters)
             command = [
-                'az', 'vm', 'list',
-                '--query', f"[?tags.Name=='{filter}' && powerState=='VM running'].[name, {instance_type}]",
+                'az', 'vm', 'list', '--show-details',
+                '--query', f"[?({names}) && powerState=='VM running'].[tags.Name, name, {fields}]",
                 '--output', 'tsv'
             ]
         elif self.cloud_provider == 'gcp':
+            names = " OR ".join(f"name ~ '{filter}'" for filter in filters)
             command = [
                 'gcloud', 'compute', 'instances', 'list',
-                '--filter', f"name ~ '{filter}' AND status=RUNNING",
-                '--format', f"value(name,{instance_type})"
+                '--filter', f"({names}) AND status=RUNNING",
+                '--format', f"value(name,{','.join(attributes)})"
             ]
         else:
             raise ValueError(f"Unsupported cloud provider: {self.cloud_provider}")
 
         result = subprocess.run(command, capture_output=True, text=True, check=True)
-        return result.stdout.strip()
+        rows = []
+        for line in result.stdout.strip().splitlines():
+            columns = line.split('\t')
+            if self.cloud_provider == 'azure':
+                key, name, values = columns[0], columns[1], columns[2:]
+            else:
+                key, name, values = columns[0], columns[0], columns[1:]
+            values += [''] * (len(attributes) - len(values))
+            rows.append((key, name, values))
+        return rows
+
+    def _matches(self, filter, key):
+        """Apply a filter locally with the same semantics as the provider CLI."""
+        if self.cloud_provider == 'aws':
+            return fnmatch.fnmatchcase(key, filter)
+        elif self.cloud_provider == 'gcp':
+            return re.search(filter, key) is not None
+        return key == filter
+
+class SSHSessionPool:
+    """Class to share one multiplexed SSH connection per host across commands and transfers."""
+    def __init__(self, pem_key_location, control_persist="10m"):
+        self.pem_key_location = pem_key_location
+        self.control_persist = control_persist
+        # Unix socket paths are limited to ~104 chars, so keep the directory short.
+        self.control_dir = tempfile.mkdtemp(prefix="kcd-ssh-")
+        self.masters = set()
+        self.timings = []
+        self.lock = threading.Lock()
+
+    def ssh_options(self, control_master="auto"):
+        """Return the ssh/scp options that route through the shared control socket."""
+        return [
+            '-i', self.pem_key_location,
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', f"ControlMaster={control_master}",
+            '-o', f"ControlPath={os.path.join(self.control_dir, '%C')}",
+            '-o', f"ControlPersist={self.control_persist}",
+        ]
+
+    def open(self, user, host):
+        """Open the master connection for user@host if it is not already open."""
+        target = f"{user}@{host}"
+        # Concurrent pipeline stages must not race to start two masters
+        with self.lock:
+            if target in self.masters:
+                return
+            start = time.monotonic()
+            result = subprocess.run(
+                ['ssh', *self.ssh_options(control_master="yes"), '-fN', target],
+                capture_output=True, text=True
+            )
+            self._record(f"connect {target}", start, result.returncode)
+            if result.returncode == 0:
+                self.masters.add(target)
+
+    def run(self, user, host, command, stdin=None, stream=False):
+        """Run a command on user@host over the shared connection, optionally feeding a file to stdin.
+
+        With stream, output is printed line by line as it arrives; either way
+        the result carries stdout, stderr and returncode.
+        """
+        self.open(user, host)
+        start = time.monotonic()
+        result = engine.run(
+            ['ssh', *self.ssh_options(), f"{user}@{host}", command],
+            check=False, stdin=stdin, capture=True, echo_output=stream
+        )
+        self._record(f"ssh {user}@{host}: {command.strip().splitlines()[0] if command.strip() else ''}",
+                     start, result.returncode)
+        return result
+
+    def copy(self, user, host, src, dst, recursive=False):
+        """Copy a local file or directory to user@host:dst over the shared connection."""
+        self.open(user, host)
+        command = ['scp', *self.ssh_options()]
+        if recursive:
+            command.append('-r')
+        command.extend([src, f"{user}@{host}:{dst}"])
+        start = time.monotonic()
+        result = engine.run(command, check=False)
+        self._record(f"scp {src} -> {user}@{host}:{dst}", start, result.returncode)
+        return result
+
+    def close(self):
+        """Stop every master connection and remove the control directory."""
+        for target in sorted(self.masters):
+            subprocess.run(
+                ['ssh', *self.ssh_options(), '-O', 'exit', target],
+                capture_output=True, text=True
+            )
+        self.masters.clear()
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+    def latency_report(self):
+        """Return a printable summary of per-command latency."""
+        lines = ["SSH latency:"]
+        for label, elapsed, returncode in self.timings:
+            lines.append(f"  {elapsed:7.2f}s  rc={returncode}  {label}")
+        total = sum(elapsed for _, elapsed, _ in self.timings)
+        lines.append(f"  {total:7.2f}s  total over {len(self.timings)} operations")
+        return "\n".join(lines)
+
+    def _record(self, label, start, returncode):
+        elapsed = time.monotonic() - start
+        self.timings.append((label, elapsed, returncode))
+        trace.complete(label.split(':')[0], time.time() - elapsed, elapsed, "ssh", command=label, exit_code=returncode)
 
 class SSHManager:
     """Class to manage SSH operations."""
-    def __init__(self, pem_key_location, bastion_ip):
+    def __init__(self, pem_key_location, bastion_ip, ssh_user="ec2-user", pool=None):
         self.pem_key_location = pem_key_location
         self.bastion_ip = bastion_ip
+        self.ssh_user = ssh_user
+        self.pool = pool or SSHSessionPool(pem_key_location)
 
     def get_ssh_user(self, os_check):
         """Determine the SSH user based on the OS type."""
@@ -76,12 +271,22 @@ class SSHManager:
         else:
             return "Unknown"
 
-    def execute_ssh_command(self, command):
-        """Execute a command on the remote server via SSH."""
-        return subprocess.run(
-            ['ssh', '-i', self.pem_key_location, '-o', 'StrictHostKeyChecking=no', f"ec2-user@{self.bastion_ip}", command],
-            capture_output=True, text=True
-        ).stdout
+    def execute_ssh_command(self, command, stream=False):
+        """Execute a command on the remote server via SSH, optionally printing its output live."""
+        return self.pool.run(self.ssh_user, self.bastion_ip, command, stream=stream).stdout
+
+    def execute_ssh_command_with_input(self, command, stdin):
+        """Execute a command on the remote server via SSH with a file as its stdin."""
+        return self.pool.run(self.ssh_user, self.bastion_ip, command, stdin=stdin)
+
+    def copy_to_remote(self, src, dst, recursive=False):
+        """Copy a local path to the remote server via SCP."""
+        return self.pool.copy(self.ssh_user, self.bastion_ip, src, dst, recursive=recursive)
+
+    def close(self):
+        """Close the pooled connections and print the latency report."""
+        print(self.pool.latency_report())
+        self.pool.close()
 
 class AnsibleManager:
     """Class to manage Ansible operations."""
@@ -93,126 +298,306 @@ class AnsibleManager:
     def generate_inventory(self, k8s_vars):
         """Generate an Ansible inventory file based on Kubernetes node details."""
         hosts_file = f"./ansible/inventories/{self.cloud_provider}/hosts"
-        with open(hosts_file, 'w') as file:
-            file.write("[master]\n")
-            for name, ip in k8s_vars.items():
-                if "master" in name:
-                    file.write(f"{ip} ansible_user={self.ssh_user} ansible_ssh_private_key_file={self.pem_key_path} node_name={name} control_plane=yes\n")
-
-            file.write("[worker]\n")
-            for name, ip in k8s_vars.items():
-                if "worker" in name:
-                    file.write(f"{ip} ansible_user={self.ssh_user} ansible_ssh_private_key_file={self.pem_key_path} node_name={name} control_plane=no\n")
+        inventory = Inventory.from_nodes(
+            k8s_vars, ansible_user=self.ssh_user, ansible_ssh_private_key_file=self.pem_key_path
+        )
+        inventory.write(hosts_file)
+        # Served as-is by ansible/inventories/kcd_inventory.py, without parsing the INI file
+        inventory.write(f"./ansible/inventories/{self.cloud_provider}/inventory.json")
 
         print(f"Ansible hosts file has been generated at {hosts_file}")
 
-def main():
+class BootstrapError(Exception):
+    """Raised by a pipeline stage to stop the bootstrap with a message."""
+
+class Pipeline:
+    """Class to run dependent stages concurrently as soon as their inputs are ready."""
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self.timings = {}
+        self.started = None
+
+    def stage(self, name, func, deps=()):
+        """Register a stage; func receives the dict of results of finished stages."""
+        self.stages[name] = (func, tuple(deps))
+
+    def _run_stage(self, name, results):
+        func, _ = self.stages[name]
+        start = time.monotonic()
+        print(f"[{start - self.started:6.1f}s] {name}: started")
+        try:
+            with trace.span(name, "stage"):
+                return func(results)
+        finally:
+            end = time.monotonic()
+            self.timings[name] = (start - self.started, end - start)
+            print(f"[{end - self.started:6.1f}s] {name}: finished in {end - start:.1f}s")
+
+    def run(self):
+        """Run every stage, raising the first failure once in-flight stages have finished."""
+        self.started = time.monotonic()
+        results = {}
+        running = {}
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                if failure is None:
+                    for name, (_, deps) in self.stages.items():
+                        if name not in results and name not in running.values() \
+                                and all(dep in results for dep in deps):
+                            running[executor.submit(self._run_stage, name, results)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        failure = failure or e
+
+        if failure is not None:
+            raise failure
+        missing = set(self.stages) - set(results)
+        if missing:
+            raise BootstrapError(f"Stages never became ready: {', '.join(sorted(missing))}")
+        return results
+
+    def timing_report(self):
+        """Return a printable per-stage timing summary."""
+        lines = ["Stage timings (start offset, duration):"]
+        for name, (offset, elapsed) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            lines.append(f"  {offset:7.1f}s  {elapsed:7.1f}s  {name}")
+        lines.append(f"  total wall time {time.monotonic() - self.started:.1f}s, "
+                     f"sum of stages {sum(e for _, e in self.timings.values()):.1f}s")
+        return "\n".join(lines)
+
+class DirectorySync:
+    """Class to sync a local directory to the remote server, sending only changed files."""
+    MANIFEST = ".kcd-manifest.json"
+
+    def __init__(self, ssh_manager, local_dir, dst_location):
+        self.ssh_manager = ssh_manager
+        self.local_dir = os.path.normpath(local_dir)
+        self.name = os.path.basename(self.local_dir)
+        self.remote_dir = os.path.join(dst_location, self.name)
+
+    def local_manifest(self):
+        """Return {relative path: sha256} for every file under the local directory."""
+        manifest = {}
+        for root, dirs, files in os.walk(self.local_dir):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if name == self.MANIFEST:
+                    continue
+                path = os.path.join(root, name)
+                digest = hashlib.sha256()
+                with open(path, 'rb') as file:
+                    for block in iter(lambda: file.read(1 << 20), b''):
+                        digest.update(block)
+                manifest[os.path.relpath(path, self.local_dir)] = digest.hexdigest()
+        return manifest
+
+    @staticmethod
+    def quote(path):
+        """Quote a remote path for the shell, keeping a leading ~ expanding to the home directory."""
+        if path == "~" or path.startswith("~/"):
+            rest = path[2:]
+            return '"$HOME"' + (f"/{shlex.quote(rest)}" if rest else "")
+        return shlex.quote(path)
+
+    def remote_manifest(self):
+        """Return the manifest recorded on the remote server by the last sync, or {}."""
+        output = self.ssh_manager.execute_ssh_command(
+            f"cat {self.quote(os.path.join(self.remote_dir, self.MANIFEST))} 2>/dev/null"
+        )
+        try:
+            return json.loads(output) if output.strip() else {}
+        except ValueError:
+            return {}
+
+    def sync(self):
+        """Send changed files as one compressed tar stream and delete removed ones."""
+        local = self.local_manifest()
+        remote = self.remote_manifest()
+        changed = sorted(path for path, digest in local.items() if remote.get(path) != digest)
+        deleted = sorted(set(remote) - set(local))
+        if not changed and not deleted:
+            print(f"{self.name}/ is up to date on the remote server, nothing to transfer")
+            return changed, deleted
+
+        print(f"Syncing {self.name}/: {len(changed)} changed, {len(deleted)} deleted, "
+              f"{len(local) - len(changed)} unchanged")
+        with tempfile.SpooledTemporaryFile(max_size=16 << 20) as stream:
+            with tarfile.open(fileobj=stream, mode="w:gz") as tar:
+                for path in changed:
+                    tar.add(os.path.join(self.local_dir, path), arcname=os.path.join(self.name, path))
+                # The manifest goes last so it only lands once every file has been extracted
+                data = json.dumps(local, indent=0, sort_keys=True).encode()
+                info = tarfile.TarInfo(os.path.join(self.name, self.MANIFEST))
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+            stream.seek(0)
+
+            remove = ""
+            if deleted:
+                paths = " ".join(self.quote(os.path.join(self.remote_dir, path)) for path in deleted)
+                remove = f" && rm -f -- {paths}"
+            parent = self.quote(os.path.dirname(self.remote_dir) or ".")
+            result = self.ssh_manager.execute_ssh_command_with_input(
+                f"mkdir -p {parent} && tar xzf - -C {parent}{remove}", stream
+            )
+        if result.returncode != 0:
+            raise BootstrapError(f"Failed to sync {self.name}/ to the remote server: {result.stderr.strip()}")
+        return changed, deleted
+
+def main(argv=None):
     """Main function to orchestrate the script execution."""
+    load_dotenv()
     parser = argparse.ArgumentParser(description='Process some integers.')
     parser.add_argument('k8s_filter', type=str, help='Kubernetes filter')
     parser.add_argument('bastion_filter', type=str, help='Bastion filter')
     parser.add_argument('pem_key_location', type=str, help='PEM key location')
     parser.add_argument('dst_location', type=str, help='Destination location')
     parser.add_argument('cloud_provider', type=str, nargs='?', default='aws', help='Cloud provider (default: aws)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the cached instance lookups')
+    parser.add_argument('--trace', metavar='FILE', help='Write a Chrome trace of every stage and SSH/scp call to FILE')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.trace:
+        trace.start(args.trace)
 
     # Check if the PEM key file exists
     if not os.path.isfile(args.pem_key_location):
         print(f"PEM key file not found: {args.pem_key_location}")
         return
 
-    # Fetch Bastion instance public IP
-    print("Fetching Bastion instance public IP...")
-    cloud_manager = CloudInstanceManager(args.cloud_provider)
-    bastion_info = cloud_manager.fetch_instance_details(args.bastion_filter, "PublicIpAddress")
-
-    if not bastion_info:
-        print("Failed to fetch Bastion instance information. Exiting.")
-        return
-
-    bastion_ip = bastion_info.split()[1]
-    print(f"Bastion Public IP: {bastion_ip}")
-
-    # Detect OS type on Bastion and determine SSH user
-    ssh_manager = SSHManager(args.pem_key_location, bastion_ip)
-    print("Checking the OS type of Bastion...")
-    os_check = ssh_manager.execute_ssh_command('cat /etc/os-release')
-
-    ssh_user = ssh_manager.get_ssh_user(os_check)
-    package_manager = ssh_manager.detect_package_manager()
-
-    print(f"Detected OS type: {os_check}")
-    print(f"SSH user: {ssh_user}")
-    print(f"Package manager: {package_manager}")
-
-    # Install Ansible and dependencies
-    print("Installing Ansible on Bastion...")
-    install_ansible_command = f"""
-    sudo hostnamectl set-hostname "bastion-node"
-    if [[ "{package_manager}" == "apt" ]]; then
-        sudo apt update -y
-        sudo apt install -y software-properties-common
-        sudo apt-add-repository --yes --update ppa:ansible/ansible
-        sudo apt install -y ansible
-    elif [[ "{package_manager}" == "dnf" || "{package_manager}" == "yum" ]]; then
-        sudo {package_manager} update -y
-        sudo {package_manager} install -y epel-release ansible
-    else
-        echo "Unsupported package manager: {package_manager}"
-        exit 1
-    fi
-    """
-    ssh_manager.execute_ssh_command(install_ansible_command)
-
-    # Copy the PEM key to Bastion using SCP
-    print("Copying PEM key to Bastion...")
-    subprocess.run(['scp', '-i', args.pem_key_location, args.pem_key_location, f"{ssh_user}@{bastion_ip}:{args.dst_location}"])
-
-    # Construct the path to the PEM key for the Ansible hosts file
-    pem_key_name = os.path.basename(args.pem_key_location)
-    pem_key_path = f"/home/{ssh_user}/{pem_key_name}"
-
-    # Generate Ansible inventory
-    print("Generating Ansible hosts file...")
-    k8s_info = cloud_manager.fetch_instance_details(args.k8s_filter, "PrivateIpAddress")
-
-    if not k8s_info:
-        print("Failed to fetch Kubernetes node information. Exiting.")
-        return
-
-    k8s_vars = {}
-    for line in k8s_info.splitlines():
-        name, ip = line.split()
-        k8s_vars[name] = ip
-
-    ansible_manager = AnsibleManager(ssh_user, pem_key_path, args.cloud_provider)
-    ansible_manager.generate_inventory(k8s_vars)
-
-    # Transfer Ansible playbook to Bastion
-    subprocess.run(['scp', '-i', args.pem_key_location, '-r', 'ansible', f"{ssh_user}@{bastion_ip}:{args.dst_location}"])
-
-    # Run the Ansible playbook
-    print("Running Ansible playbook on Bastion...")
-    run_playbook_command = f"""
-    cd ansible/
-    ansible-playbook -i inventories/{args.cloud_provider}/hosts site.yml
-    cd ~/
-    sudo mkdir -p /home/{ssh_user}/.kube
-    sudo cp /tmp/admin.conf /home/{ssh_user}/.kube/config
-
-    sudo chown -R {ssh_user}:{ssh_user} /home/{ssh_user}/.kube
-    sudo chmod 600 /home/{ssh_user}/.kube/config
-
-    echo "export KUBECONFIG=/home/{ssh_user}/.kube/config" >> /home/{ssh_user}/.bashrc
-    source /home/{ssh_user}/.bashrc
-
-    echo "Testing kubectl..."
-    kubectl get nodes
-    """
-    ssh_manager.execute_ssh_command(run_playbook_command)
-
-    print("Ansible playbook execution completed.")
+    cloud_manager = CloudInstanceManager(args.cloud_provider, InstanceCache(ttl=0) if args.no_cache else None)
+    ssh_manager = SSHManager(args.pem_key_location, None)
+
+    def discover(results):
+        # Discover the bastion and the k8s nodes with a single describe call
+        print("Fetching Bastion instance public IP and Kubernetes node IPs...")
+        bastion_lookup = (args.bastion_filter, "PublicIpAddress")
+        k8s_lookup = (args.k8s_filter, "PrivateIpAddress")
+        instances = cloud_manager.fetch_instances([bastion_lookup, k8s_lookup])
+        bastion_info = instances[bastion_lookup]
+
+        if not bastion_info:
+            raise BootstrapError("Failed to fetch Bastion instance information. Exiting.")
+
+        bastion_ip = bastion_info.split()[1]
+        print(f"Bastion Public IP: {bastion_ip}")
+        ssh_manager.bastion_ip = bastion_ip
+        return instances[k8s_lookup]
+
+    def check_os(results):
+        # Detect OS type on Bastion and determine SSH user
+        print("Checking the OS type of Bastion...")
+        os_check = ssh_manager.execute_ssh_command('cat /etc/os-release')
+
+        ssh_user = ssh_manager.get_ssh_user(os_check)
+        package_manager = ssh_manager.detect_package_manager()
+        # Reuse the detected user for the rest of the run so every step shares one connection
+        if ssh_user != "Unknown":
+            ssh_manager.ssh_user = ssh_user
+
+        print(f"Detected OS type: {os_check}")
+        print(f"SSH user: {ssh_user}")
+        print(f"Package manager: {package_manager}")
+        return ssh_user, package_manager
+
+    def install_ansible(results):
+        _, package_manager = results['check_os']
+        print("Installing Ansible on Bastion...")
+        install_ansible_command = f"""
+        sudo hostnamectl set-hostname "bastion-node"
+        if [[ "{package_manager}" == "apt" ]]; then
+            sudo apt update -y
+            sudo apt install -y software-properties-common
+            sudo apt-add-repository --yes --update ppa:ansible/ansible
+            sudo apt install -y ansible
+        elif [[ "{package_manager}" == "dnf" || "{package_manager}" == "yum" ]]; then
+            sudo {package_manager} update -y
+            sudo {package_manager} install -y epel-release ansible
+        else
+            echo "Unsupported package manager: {package_manager}"
+            exit 1
+        fi
+        """
+        ssh_manager.execute_ssh_command(install_ansible_command)
+
+    def copy_key(results):
+        print("Copying PEM key to Bastion...")
+        ssh_manager.copy_to_remote(args.pem_key_location, args.dst_location)
+
+    def write_inventory(results):
+        k8s_info = results['discover']
+        if not k8s_info:
+            raise BootstrapError("Failed to fetch Kubernetes node information. Exiting.")
+
+        k8s_vars = {}
+        for line in k8s_info.splitlines():
+            name, ip = line.split()
+            k8s_vars[name] = ip
+
+        # Construct the path to the PEM key for the Ansible hosts file
+        ssh_user, _ = results['check_os']
+        pem_key_name = os.path.basename(args.pem_key_location)
+        pem_key_path = f"/home/{ssh_user}/{pem_key_name}"
+
+        print("Generating Ansible hosts file...")
+        ansible_manager = AnsibleManager(ssh_user, pem_key_path, args.cloud_provider)
+        ansible_manager.generate_inventory(k8s_vars)
+
+    def sync_ansible(results):
+        # Only files whose hash differs from the bastion's manifest are sent
+        DirectorySync(ssh_manager, 'ansible', args.dst_location).sync()
+
+    def run_playbook(results):
+        ssh_user, _ = results['check_os']
+        print("Running Ansible playbook on Bastion...")
+        run_playbook_command = f"""
+        cd ansible/
+        KCD_PROVIDER={args.cloud_provider} ansible-playbook -i inventories/kcd_inventory.py site.yml
+        cd ~/
+        sudo mkdir -p /home/{ssh_user}/.kube
+        sudo cp /tmp/admin.conf /home/{ssh_user}/.kube/config
+
+        sudo chown -R {ssh_user}:{ssh_user} /home/{ssh_user}/.kube
+        sudo chmod 600 /home/{ssh_user}/.kube/config
+
+        echo "export KUBECONFIG=/home/{ssh_user}/.kube/config" >> /home/{ssh_user}/.bashrc
+        source /home/{ssh_user}/.bashrc
+
+        echo "Testing kubectl..."
+        kubectl get nodes
+        """
+        ssh_manager.execute_ssh_command(run_playbook_command, stream=True)
+
+    # Node discovery, inventory and the ansible/ sync do not wait for the Ansible install
+    pipeline = Pipeline()
+    pipeline.stage('discover', discover)
+    pipeline.stage('check_os', check_os, deps=['discover'])
+    pipeline.stage('install_ansible', install_ansible, deps=['check_os'])
+    pipeline.stage('copy_key', copy_key, deps=['check_os'])
+    pipeline.stage('write_inventory', write_inventory, deps=['discover', 'check_os'])
+    pipeline.stage('sync_ansible', sync_ansible, deps=['write_inventory'])
+    pipeline.stage('run_playbook', run_playbook, deps=['install_ansible', 'copy_key', 'sync_ansible'])
+
+    try:
+        pipeline.run()
+        print("Ansible playbook execution completed.")
+    except BootstrapError as e:
+        print(str(e))
+    finally:
+        print(pipeline.timing_report())
+        ssh_manager.close()
+        trace_path = trace.finish()
+        if trace_path:
+            print(f"Trace written to {trace_path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,13 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_namespace_packages
 
 setup(
     name='kcdcli',
     version='0.1.0',
-    packages=find_packages(),
+    packages=find_namespace_packages(include=['cli', 'cli.*']),
+    py_modules=['kcdcli', 'main', 'run_commands'],
     install_requires=[
         'click',
+        'python-dotenv',
     ],
     entry_points={
         'console_scripts': [
@@ -22,5 +24,5 @@ setup(
         'Programming Language :: Python :: 3',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 )
\ No newline at end of file
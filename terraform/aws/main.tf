@@ -30,8 +30,9 @@ module "iam" {
 module "ec2_instances" {
   source             = "./modules/ec2_instances"
   private_subnet_id  = module.network.private_subnet_id
-  ami_id             = var.ami_id
+  ami_id             = var.node_ami_id != "" ? var.node_ami_id : var.ami_id
   instance_type      = var.ec2_instance_type
+  worker_count       = var.worker_count
   key_name           = var.key_name
   control_plane_sg_id = module.security_groups.control_plane_sg_id
   worker_sg_id        = module.security_groups.worker_sg_id
@@ -8,10 +8,15 @@ resource "aws_instance" "master" {
   tags = {
     Name = "k8s-master"
   }
+  # A new node image (node_ami_id) only applies to instances created from now
+  # on; existing nodes are kept instead of being replaced
+  lifecycle {
+    ignore_changes = [ami]
+  }
 }
 
 resource "aws_instance" "worker" {
-  count           = 2
+  count           = var.worker_count
   ami             = var.ami_id
   instance_type   = var.instance_type
   subnet_id       = var.private_subnet_id
@@ -21,6 +26,11 @@ resource "aws_instance" "worker" {
   tags = {
     Name = "k8s-worker-${count.index + 1}"
   }
+  # A new node image (node_ami_id) only applies to instances created from now
+  # on; existing nodes are kept instead of being replaced
+  lifecycle {
+    ignore_changes = [ami]
+  }
 }
 
 output "master_ip" {
@@ -6,4 +6,7 @@ variable "worker_sg_id" {}
 variable "key_name" {}
 variable "instance_profile" {
   
-}
\ No newline at end of file
+}
+variable "worker_count" {
+  default = 2
+}
@@ -7,3 +7,15 @@ variable "ec2_instance_type" {}
 variable "key_name" {}
 variable "my_ip" {}
 variable "aws_region" {}
+
+# Pre-baked node image written by `cluster image build` (kcd-image.auto.tfvars.json);
+# empty means the nodes boot from ami_id like the bastion. Only nodes created
+# after the build use it; existing nodes ignore AMI changes
+variable "node_ami_id" {
+  default = ""
+}
+
+# Number of worker nodes; `cluster scale` keeps it in kcd-scale.auto.tfvars.json
+variable "worker_count" {
+  default = 2
+}